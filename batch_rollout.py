@@ -0,0 +1,150 @@
+"""
+Vectorized rollouts: many determinized games played at once with NumPy.
+
+A batch of B games is a set of arrays:
+    hands   (B, 2, H) the cards of player 1 and 2, -1 for an empty slot
+    lead    (B,) the card on the table, -1 if the table is empty
+    leader  (B,) 0 or 1, the player who leads the current trick
+    points  (B, 2) the points already taken by player 1 and 2
+    deck    (B, D) the cards still to draw, in order, with the briscola last
+
+All the games are played with the greedy policy of generate_move_smart:
+the leader plays its lowest card, the follower the card with the best trick value.
+Cards are the integers of cards.py.
+"""
+
+import numpy as np
+
+from cards import CARD_INDEX, POINTS, SUIT_INDEX
+from card_tables import VALUE, WINNER
+from determinization import DeterminizationSampler
+from utilities import Utility
+
+VALUE_ARRAY = np.array(VALUE)
+POINTS_ARRAY = np.array(POINTS)
+WINNER_ARRAY = np.array(WINNER, dtype=bool)  # (trump suit, first card, second card)
+WIN = Utility('win')  # the default utility of batch_wins
+
+
+def choose_lead(hand, forced=None):
+    """Return the slot of the card each leader plays: the lowest one, or the forced card."""
+    if forced is not None:
+        return np.argmax(hand == forced, axis=1)
+    values = np.where(hand >= 0, VALUE_ARRAY[hand], np.inf)
+    return np.argmin(values, axis=1)
+
+
+def choose_answer(hand, lead, winner, forced=None):
+    """Return the slot of the card each follower plays: the one with the best trick value, or the forced card."""
+    if forced is not None:
+        return np.argmax(hand == forced, axis=1)
+    total = VALUE_ARRAY[lead][:, None] + VALUE_ARRAY[hand]
+    score = np.where(winner[lead[:, None], hand], -total, total)
+    score = np.where(hand >= 0, score, -np.inf)
+    return np.argmax(score, axis=1)
+
+
+def play_out(hands, lead, leader, points, deck, trump_suit, forced=None):
+    """
+    Play all the games of a batch to the end and return the final points (B, 2).
+    If forced is a card, it is the next card played by the player to move in every game.
+    The arrays are modified in place.
+    """
+    winner_table = WINNER_ARRAY[trump_suit]
+    games = np.arange(len(hands))
+    slots = np.arange(hands.shape[2])
+    last = hands.shape[2] - 1
+    draw = 0
+
+    while True:
+        if lead is None:
+            if (hands[:, 0] < 0).all() and (hands[:, 1] < 0).all():
+                return points
+            leader_hand = hands[games, leader]
+            slot = choose_lead(leader_hand, forced)
+            forced = None
+            lead = leader_hand[games, slot]
+            hands[games, leader, slot] = -1
+
+        follower = 1 - leader
+        follower_hand = hands[games, follower]
+        slot = choose_answer(follower_hand, lead, winner_table, forced)
+        forced = None
+        answer = follower_hand[games, slot]
+        hands[games, follower, slot] = -1
+
+        # the winner takes the points of the trick and leads the next one
+        leader = np.where(winner_table[lead, answer], leader, follower)
+        points[games, leader] += POINTS_ARRAY[lead] + POINTS_ARRAY[answer]
+        lead = None
+
+        # player 1 draws first, then player 2, as in draw_cards
+        if draw < deck.shape[1]:
+            # the cards after the one just played move up a slot and the drawn card goes after them,
+            # as in the lists of the dictionary states, so that ties are broken the same way
+            hole = np.argmax(hands < 0, axis=2)[:, :, None]
+            hands[:] = np.take_along_axis(hands, np.minimum(slots + (slots >= hole), last), axis=2)
+            hands[:, :, last] = -1
+            for p in (0, 1):
+                empty = np.argmax(hands[:, p] < 0, axis=1)
+                hands[games, p, empty] = deck[:, draw]
+                draw += 1
+
+
+def deal_batch(state, n, rng=None, sampler=None):
+    """
+    Return n determinizations of a Briscola state as batch arrays, seen from the player to move:
+    (hands, lead, leader, points, deck, trump_suit). The opponent's hands and the decks are drawn
+    by sampler (a DeterminizationSampler of state), a uniform one with the generator rng if not given.
+    """
+    if sampler is None:
+        sampler = DeterminizationSampler(state, seed=rng or np.random.default_rng())
+    player = state['player']
+    hand = [CARD_INDEX[card] for card in state['hand' + str(player)]]
+    table = [CARD_INDEX[card] for card in state['table']]
+    opponent, deck = sampler.sample_indices(n)
+    n_opponent = opponent.shape[1]
+
+    width = max(len(hand), 1)
+    hands = np.full((n, 2, width), -1, dtype=np.int64)
+    hands[:, player - 1, :len(hand)] = hand
+    hands[:, 2 - player, :n_opponent] = opponent
+
+    lead = np.full(n, table[0]) if table else None
+    # the leader of the current trick is the opponent if they already played
+    leader = np.full(n, (2 - player) if table else (player - 1))
+    points = np.zeros((n, 2), dtype=np.int64)
+    points[:, 0] = sum(POINTS[CARD_INDEX[card]] for card in state['taken1'])
+    points[:, 1] = sum(POINTS[CARD_INDEX[card]] for card in state['taken2'])
+    return hands, lead, leader, points, deck, SUIT_INDEX[state['briscola'][1]]
+
+
+def batch_rollout(state, n, move=None, rng=None, sampler=None):
+    """
+    Play n determinized games from state with the greedy policy, the first one starting with move
+    if it is given, and return the final points of the player to move in each game, shape (n,).
+    """
+    hands, lead, leader, points, deck, trump_suit = deal_batch(state, n, rng, sampler)
+    forced = None if move is None else CARD_INDEX[move]
+    points = play_out(hands, lead, leader, points, deck, trump_suit, forced)
+    return points[:, state['player'] - 1]
+
+
+def batch_wins(state, n, move=None, rng=None, sampler=None, utility=None):
+    """Same as batch_rollout, but return the utility of the player to move in each game (a Utility of
+    utilities.py): by default 1 if they have more than 60 points, 0.5 if they have 60 and 0 otherwise."""
+    return (utility or WIN).of_points(batch_rollout(state, n, move, rng, sampler))
+
+
+def batch_wins_paired(state, n, moves, rng=None, sampler=None, utility=None):
+    """
+    Play the same n determinized games from state once for each of moves, starting with it,
+    and return the utility of the player to move as batch_wins, shape (n, len(moves)).
+    The games only differ by the first move, so the moves are compared with common random numbers.
+    """
+    hands, lead, leader, points, deck, trump_suit = deal_batch(state, n, rng, sampler)
+    wins = np.empty((n, len(moves)))
+    for j, move in enumerate(moves):
+        final = play_out(hands.copy(), lead, leader, points.copy(), deck, trump_suit, CARD_INDEX[move])
+        wins[:, j] = (utility or WIN).of_points(final[:, state['player'] - 1])
+    return wins
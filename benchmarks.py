@@ -0,0 +1,338 @@
+"""
+Benchmarks of the Briscola engine, the players and the search code.
+
+    python benchmarks.py suite --output results.json --baseline baseline.json
+    python benchmarks.py policies -n 2000 --states 5
+    python benchmarks.py parallel --time 1000 --workers 1 2 4 8 16 32
+    python benchmarks.py rollouts --games 1000
+
+suite: calls per second of the engine primitives (actions, result, terminal_test,
+utility, compare_cards, draw_cards, copy_state), random and greedy games per second,
+and the decision latency of each player of PLAYER_CONFIGS at a fixed budget. The
+results can be saved as JSON, and compared with a baseline saved the same way: a
+result that is worse than the baseline by more than the threshold is a regression,
+and the command exits with status 1. Baselines only compare on the same machine.
+
+policies: iterations per second of monte_carlo_tree_search_pool with each tree
+policy of tree_policies, on the same seeded states. The strength of a policy is
+measured with tournament.py, for example
+    python tournament.py "PolicyMCTSPlayer:policy='PUCT',prior='greedy'" "PolicyMCTSPlayer:policy='UCB1'"
+
+parallel: iterations per second of monte_carlo_tree_search with root and tree
+parallelization for each number of workers, on the same seeded states, and the
+speedup over one worker.
+
+rollouts: for each rollout policy of ROLLOUT_CONFIGS, the moves and whole games it
+plays per second, and its strength as a player: the mean point difference per deal
+against generate_move_smart over seeded deals played from both seats.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from briscola_game import Briscola
+from games4e import monte_carlo_tree_search, monte_carlo_tree_search_pool
+from tools import compare_cards, copy_state, draw_cards, generate_move_smart
+from tournament import deal, make_player, points
+from tree_policies import make_policy
+from playout_policies import make_rollout
+
+# the players timed by the suite, as specs of tournament.make_player, with fixed budgets
+PLAYER_CONFIGS = ['SmartPlayer',
+                  'MonteCarloTreeSearchPlayer:simulations=100,reuse_tree=False',
+                  'MyMonteCarloTreeSearchPlayer:simulations=50',
+                  'MyMonteCarloTreeSearchPlayer:simulations=500,vectorized=True',
+                  'InformationSetMCTSPlayer:simulations=500,reuse_tree=False',
+                  'PolicyMCTSPlayer:simulations=500',
+                  'AlphaBetaPruningPlayer']
+
+# the policies compared by default, as (name, arguments of make_policy)
+POLICY_CONFIGS = [('UCB1', {'C': 1.4}),
+                  ('UCB1', {'C': 0.7}),
+                  ('UCB1Tuned', {'C': 1.0}),
+                  ('PUCT', {'C': 1.5}),
+                  ('PUCT', {'C': 1.5, 'prior': 'greedy'}),
+                  ('ThompsonSampling', {'seed': 0})]
+
+# the rollout policies compared by default, as (name, arguments of make_rollout)
+ROLLOUT_CONFIGS = [('smart', {}),
+                   ('greedy', {}),
+                   ('heavy', {}),
+                   ('heavy', {'epsilon': 0.1}),
+                   ('heavy', {'temperature': 2.0})]
+
+
+def benchmark_states(n_states, seed=0):
+    """Return n_states seeded initial states with player 1 to move, seen as in MonteCarloTreeSearchPlayer:
+    player 2 may hold any card that player 1 has not seen."""
+    states = []
+    for i in range(n_states):
+        state = deal(seed + i)
+        state['player'] = 1
+        state['hand2'] = state['hand2'] + state['deck']
+        states.append(state)
+    return states
+
+
+def benchmark_policies(n_iterations=2000, n_states=5, configs=POLICY_CONFIGS, seed=0):
+    """Run n_iterations of monte_carlo_tree_search_pool on n_states states with each policy of configs,
+    and return a list of (policy, iterations per second)."""
+    game = Briscola()
+    states = benchmark_states(n_states, seed)
+    results = []
+    for name, kwargs in configs:
+        policy = make_policy(name, **kwargs)
+        elapsed = 0.0
+        for i, state in enumerate(states):
+            # the same rollouts for every policy
+            random.seed(seed + i)
+            start = time.perf_counter()
+            monte_carlo_tree_search_pool(state, game, n_iterations, policy=policy)
+            elapsed += time.perf_counter() - start
+        results.append((policy, n_iterations * n_states / elapsed))
+    return results
+
+
+def benchmark_parallel(workers=(1, 2, 4, 8, 16, 32), modes=('root', 'tree'), time_limit_ms=1000, n_states=3, seed=0):
+    """Search n_states states for time_limit_ms with monte_carlo_tree_search in each parallel mode
+    and with each number of workers, and return a list of (mode, workers, iterations per second, speedup)."""
+    game = Briscola()
+    states = benchmark_states(n_states, seed)
+    results = []
+    for mode in modes:
+        base = None
+        for n_workers in workers:
+            # the processes are started before the clock, as a player keeps its pool between moves
+            executor = ProcessPoolExecutor(n_workers) if mode == 'root' and n_workers > 1 else None
+            iterations, elapsed = 0, 0.0
+            for i, state in enumerate(states):
+                random.seed(seed + i)
+                info = {}
+                start = time.perf_counter()
+                monte_carlo_tree_search(state, game, time_limit_ms=time_limit_ms, info=info,
+                                        n_workers=n_workers, parallel=mode, executor=executor)
+                elapsed += time.perf_counter() - start
+                iterations += info['iterations']
+            if executor is not None:
+                executor.shutdown()
+            speed = iterations / elapsed
+            base = base or speed
+            results.append((mode, n_workers, speed, speed / base))
+    return results
+
+
+def midgame_states(n_states, seed=0):
+    """Return n_states states with player 1 to move and cards still in the deck, reached by
+    playing a few greedy moves from seeded deals."""
+    game = Briscola()
+    states = []
+    for i in range(n_states):
+        random.seed(seed + i)
+        state = deal(seed + i)
+        for _ in range(2 * (i % 6)):
+            state = game.result(state, generate_move_smart(state, game))
+        while state['player'] != 1:
+            state = game.result(state, generate_move_smart(state, game))
+        states.append(state)
+    return states
+
+
+def rate(function, arguments, min_time=0.2, repeat=3):
+    """Return the calls per second of function, called on each tuple of arguments in turn
+    for at least min_time seconds, the best of repeat runs."""
+    best = 0.0
+    for _ in range(repeat):
+        calls, start = 0, time.perf_counter()
+        while True:
+            for args in arguments:
+                function(*args)
+            calls += len(arguments)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+    return best
+
+
+def benchmark_primitives(n_states=20, min_time=0.2, seed=0):
+    """Return the calls per second of the engine primitives, on midgame states."""
+    game = Briscola()
+    states = midgame_states(n_states, seed)
+    finished = []
+    for state in states:
+        while not game.terminal_test(state):
+            state = game.result(state, generate_move_smart(state, game))
+        finished.append(state)
+    moves = [(state, game.actions(state)[0]) for state in states]
+    pairs = [(a, b, state['briscola']) for state in states for a in state['hand1'] for b in state['hand1'] if a != b]
+    return {'actions': rate(game.actions, [(state,) for state in states], min_time),
+            'result': rate(game.result, moves, min_time),
+            'terminal_test': rate(game.terminal_test, [(state,) for state in states], min_time),
+            'utility': rate(game.utility, [(state, 1) for state in finished], min_time),
+            'compare_cards': rate(compare_cards, pairs, min_time),
+            'copy_state': rate(copy_state, [(state,) for state in states], min_time),
+            # draw_cards changes the state, so each call draws from a new copy
+            'copy_state + draw_cards': rate(lambda state: draw_cards(copy_state(state)), [(state,) for state in states], min_time)}
+
+
+def benchmark_games(n_games=200, seed=0):
+    """Return the random and greedy games played per second from seeded deals."""
+    game = Briscola()
+    policies = {'random': lambda state: random.choice(game.actions(state)),
+                'greedy': lambda state: generate_move_smart(state, game)}
+    results = {}
+    for name, policy in policies.items():
+        random.seed(seed)
+        start = time.perf_counter()
+        for i in range(n_games):
+            state = deal(seed + i)
+            while not game.terminal_test(state):
+                state = game.result(state, policy(state))
+        results[name] = n_games / (time.perf_counter() - start)
+    return results
+
+
+def benchmark_decisions(specs=PLAYER_CONFIGS, n_states=5, seed=0):
+    """Return the mean time in milliseconds that each player of specs takes to choose a move
+    on the same midgame states."""
+    game = Briscola()
+    states = midgame_states(n_states, seed)
+    results = {}
+    for spec in specs:
+        player = make_player(spec)
+        elapsed = 0.0
+        for i, state in enumerate(states):
+            random.seed(seed + i)
+            state = copy_state(state)
+            start = time.perf_counter()
+            player.generate_move(state, game)
+            elapsed += time.perf_counter() - start
+        results[spec] = 1000 * elapsed / n_states
+    return results
+
+
+def benchmark_rollouts(n_games=500, configs=ROLLOUT_CONFIGS, seed=0):
+    """Return a list of (name, moves per second, games per second, mean point difference) for
+    each rollout policy of configs. The speeds are those of whole games played by the policy
+    against itself, the point difference that of the policy against generate_move_smart, on
+    n_games seeded deals played from both seats."""
+    game = Briscola()
+    results = []
+    for name, kwargs in configs:
+        rollout = make_rollout(name, **kwargs)
+        label = name + ''.join(', {}={}'.format(key, value) for key, value in kwargs.items())
+        random.seed(seed)
+        states = [deal(seed + i) for i in range(n_games)]
+        moves, start = 0, time.perf_counter()
+        for state in states:
+            while not game.terminal_test(state):
+                state = game.result(state, rollout(state, game))
+                moves += 1
+        elapsed = time.perf_counter() - start
+        # the policy against generate_move_smart, the same deals with the seats swapped
+        difference = 0
+        for i in range(n_games):
+            for seat in (1, 2):
+                state = deal(seed + i)
+                while not game.terminal_test(state):
+                    policy = rollout if state['player'] == seat else generate_move_smart
+                    state = game.result(state, policy(state, game))
+                difference += points(state['taken' + str(seat)]) - points(state['taken' + str(3 - seat)])
+        results.append((label, moves / elapsed, n_games / elapsed, difference / (2 * n_games)))
+    return results
+
+
+def run_suite(quick=False, seed=0):
+    """Run the whole suite and return its results: a dictionary of metric name -> {'value', 'unit'}.
+    The unit tells the direction: more calls/sec or games/sec is better, fewer ms is better.
+    quick uses fewer states and games, for a rough check."""
+    results = {}
+    for name, value in benchmark_primitives(5 if quick else 20, 0.05 if quick else 0.2, seed).items():
+        results['primitive/' + name] = {'value': value, 'unit': 'calls/sec'}
+    for name, value in benchmark_games(20 if quick else 200, seed).items():
+        results['games/' + name] = {'value': value, 'unit': 'games/sec'}
+    for name, value in benchmark_decisions(n_states=2 if quick else 5, seed=seed).items():
+        results['decision/' + name] = {'value': value, 'unit': 'ms'}
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """Return the regressions of results against baseline, as a list of
+    (metric, baseline value, new value, relative change): the metrics that are worse by more than threshold.
+    The relative change is positive when the result is worse."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], result['value']
+        if result['unit'] == 'ms':
+            change = (new - old) / old
+        else:
+            change = (old - new) / old
+        if change > threshold:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the search code.")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    policies = subparsers.add_parser('policies', help="iterations per second of each tree policy")
+    policies.add_argument('-n', '--iterations', type=int, default=2000, help="iterations of each search")
+    policies.add_argument('--states', type=int, default=5, help="number of states searched")
+    policies.add_argument('--seed', type=int, default=0, help="seed of the first state")
+    suite = subparsers.add_parser('suite', help="engine primitives, games per second and decision latency")
+    suite.add_argument('--quick', action='store_true', help="fewer states and games")
+    suite.add_argument('--seed', type=int, default=0, help="seed of the states and games")
+    suite.add_argument('--output', help="save the results to this JSON file")
+    suite.add_argument('--baseline', help="compare the results with this JSON file")
+    suite.add_argument('--threshold', type=float, default=0.1, help="relative slowdown that counts as a regression")
+    parallel = subparsers.add_parser('parallel', help="scaling of root and tree parallel MCTS")
+    parallel.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help="numbers of workers")
+    parallel.add_argument('--modes', nargs='+', default=['root', 'tree'], choices=['root', 'tree'])
+    parallel.add_argument('--time', type=int, default=1000, help="time limit of each search in milliseconds")
+    parallel.add_argument('--states', type=int, default=3, help="number of states searched")
+    parallel.add_argument('--seed', type=int, default=0, help="seed of the first state")
+    rollouts = subparsers.add_parser('rollouts', help="speed and strength of each rollout policy")
+    rollouts.add_argument('--games', type=int, default=500, help="number of seeded deals")
+    rollouts.add_argument('--seed', type=int, default=0, help="seed of the first deal")
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        results = run_suite(args.quick, args.seed)
+        for name, result in results.items():
+            print("{:<70} {:14.3f} {}".format(name, result["value"], result["unit"]))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results}, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)['results']
+            regressions = compare(results, baseline, args.threshold)
+            for name, old, new, change in regressions:
+                print("REGRESSION {}: {:.1f} -> {:.1f} ({:+.0%})".format(name, old, new, change))
+            if regressions:
+                sys.exit(1)
+            print("No regression over {:.0%} against {}".format(args.threshold, args.baseline))
+
+    elif args.benchmark == 'policies':
+        for policy, speed in benchmark_policies(args.iterations, args.states, seed=args.seed):
+            print("{:<45} {:10.0f} iterations/sec".format(repr(policy), speed))
+
+    elif args.benchmark == 'parallel':
+        for mode, n_workers, speed, speedup in benchmark_parallel(args.workers, args.modes, args.time, args.states, args.seed):
+            print("{:<5} {:3d} workers {:10.0f} iterations/sec {:6.2f}x".format(mode, n_workers, speed, speedup))
+
+    elif args.benchmark == 'rollouts':
+        for label, moves, games, difference in benchmark_rollouts(args.games, seed=args.seed):
+            print("{:<25} {:10.0f} moves/sec {:8.0f} games/sec {:+7.2f} points/deal against smart".format(
+                label, moves, games, difference))
+
+
+if __name__ == '__main__':
+    main()
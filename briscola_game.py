@@ -1,7 +1,12 @@
 import random
 from copy import deepcopy
+from operator import itemgetter
+
+import numpy as np
+
 from games4e import Game
-from tools import get_card_value, compare_cards, draw_cards
+from tools import get_card_value, compare_cards, copy_state, draw_cards
+from utilities import make_utility
 
 class Briscola(Game):
     """
@@ -18,21 +23,53 @@ class Briscola(Game):
     state = {'hand1': hand1, 'hand2': hand2, 'table': table, 'player': player, 'taken1': taken1, 'taken2': taken2, 'briscola': briscola, 'deck': deck}
 
     Each card is represented by a tuple of (suit, rank).
-    The deck is represented by a list of cards.    
+    The deck is represented by a list of cards, already shuffled: the cards are drawn
+    from its end, and the briscola is drawn after the last one.
     """
 
     full_deck = [(i, suit) for i in ['Ace', '2', '3', '4', '5', '6', '7', 'Jack', 'Horse', 'King'] for suit in ['Bastoni', 'Denari', 'Spade', 'Coppe']]
 
-    # the initial state is a random trump, random hands and a random player to move
-    my_sample = random.sample(full_deck, 7)
-    hand1, hand2, trump = my_sample[:3], my_sample[3:6], [my_sample[6]]
-    # delete the cards from the deck
-    deck = full_deck
-    for card in my_sample:
-        deck.remove(card)
-
-    trump = trump[0]
-    initial = {'hand1': hand1, 'hand2': hand2, 'table': [], 'player': random.choice([1, 2]), 'taken1': [], 'taken2': [], 'briscola': trump, 'deck': deck}   
+    def __init__(self, seed=None, utility='win'):
+        """The initial state is a new random deal, see new_game. utility is the utility of the
+        final states, a name or a Utility of utilities.py."""
+        self.initial = self.new_game(seed)
+        self.utility_function = make_utility(utility)
+
+    @classmethod
+    def new_game(cls, seed=None):
+        """
+        Return a new initial state: a random trump, random hands, a shuffled deck and a random
+        player to move. The same seed always gives the same state, without a seed the cards
+        are dealt with the global random generator.
+        """
+        rng = random.Random(seed) if seed is not None else random
+        cards = list(cls.full_deck)
+        rng.shuffle(cards)
+        return cls.deal(cards, rng.choice([1, 2]))
+
+    @classmethod
+    def new_games(cls, n=None, seed=0, chunk=4096):
+        """
+        Generate n initial states (without end if n is None), the same ones for the same seed.
+        The decks are shuffled chunk at a time with NumPy, which is much faster than new_game
+        when many games are needed, e.g. for self-play.
+        """
+        rng = np.random.default_rng(seed)
+        remaining = n
+        while remaining is None or remaining > 0:
+            size = chunk if remaining is None else min(chunk, remaining)
+            orders = rng.permuted(np.tile(np.arange(40), (size, 1)), axis=1).tolist()
+            players = rng.integers(1, 3, size).tolist()
+            for order, player in zip(orders, players):
+                yield cls.deal(list(itemgetter(*order)(cls.full_deck)), player)
+            if remaining is not None:
+                remaining -= size
+
+    @staticmethod
+    def deal(cards, player):
+        """Return the initial state where the cards are dealt in order: three to each player, then the trump."""
+        return {'hand1': cards[:3], 'hand2': cards[3:6], 'table': [], 'player': player,
+                'taken1': [], 'taken2': [], 'briscola': cards[6], 'deck': cards[7:]}
 
     def actions(self, state):
         """Return a list of the allowable moves at this point."""
@@ -43,7 +80,7 @@ class Briscola(Game):
         """Return the state that results from making a move from a state."""
         # move is the card played by the player to move
         # the card is removed from the hand of the player to move
-        new_state = deepcopy(state)
+        new_state = copy_state(state)
         new_state['hand' + str(new_state['player'])].remove(move)
 
         # the card is added to the table
@@ -66,6 +103,7 @@ class Briscola(Game):
 
             # update the state
             # each player draws a card from the deck if there are still cards in the deck
+            # the new state has its own deck and hands, so the cards are drawn in place
             if new_state['deck']:
                 new_state = draw_cards(new_state)
 
@@ -85,6 +123,58 @@ class Briscola(Game):
             new_state['player'] = 3 - new_state['player']
             return new_state
 
+    def apply(self, state, move):
+        """
+        Make a move in place and return the token that undo needs to take it back.
+        Same rules as result, without copying the state.
+        """
+        player = state['player']
+        hand = state['hand' + str(player)]
+        index = hand.index(move)
+        del hand[index]
+        table = state['table']
+        table.append(move)
+
+        # if there is only one card on the table, the player to move is changed
+        if len(table) == 1:
+            state['player'] = 3 - player
+            return (player, index, None)
+
+        # if the first card wins, the player that had just moved loses the trick
+        if compare_cards(table[0], table[1], state['briscola']):
+            winner = 3 - player
+        else:
+            winner = player
+
+        # each player draws a card from the deck, the last one draws the briscola
+        # drawn tells if the second card came from the deck
+        drawn = None
+        if state['deck']:
+            drawn = len(state['deck']) > 1
+            draw_cards(state)
+
+        state['taken' + str(winner)].extend(table)
+        state['table'] = []
+        state['player'] = winner
+        return (player, index, (table, winner, drawn))
+
+    def undo(self, state, token):
+        """Take back the move made by apply, given the token it returned."""
+        player, index, trick = token
+        if trick is not None:
+            table, winner, drawn = trick
+            del state['taken' + str(winner)][-2:]
+            if drawn is not None:
+                card2 = state['hand2'].pop()
+                card1 = state['hand1'].pop()
+                if drawn:
+                    state['deck'].append(card2)
+                state['deck'].append(card1)
+            state['table'] = table
+        move = state['table'].pop()
+        state['hand' + str(player)].insert(index, move)
+        state['player'] = player
+
     def result_real_game(self, state, move):
         """Return the state that results from making a move from a state."""
         # move is the card played by the player to move
@@ -151,15 +241,9 @@ class Briscola(Game):
 
     def utility(self, state, player):
         """Return the value of this final state to player."""
-        # the player wins if the sum of all cards they took is greater than 60
-        sum_me = sum(get_card_value(card) for card in state['taken' + str(player)])
-        # sum_opponent = sum(get_card_value(card) for card in state['taken' + str(3 - player)])
+        # by default 1 if the player took more than 60 points, 0.5 for a 60-60 draw and 0 otherwise
+        return self.utility_function(state, player)
 
-        if sum_me > 60:
-            return 1
-        else:
-            return 0
-        
     def terminal_test(self, state):
         """Return True if this is a final state for the game."""
         # the game is over if the deck is empty and the players have no more cards in their hands
@@ -207,10 +291,10 @@ class Briscola(Game):
             # the player to move makes a move
             state_copy = deepcopy(state)
             if self.to_move(state) == 1:
-                move = player1.generate_move(state_copy, Briscola()) # this is the mcts player
+                move = player1.generate_move(state_copy, self) # this is the mcts player
                 print("I play: ", move)
             else:
-                move = player2.generate_move(state_copy, Briscola()) # this is the human player
+                move = player2.generate_move(state_copy, self) # this is the human player
 
             # the move is applied to the state
             state = self.result_real_game(state, move)
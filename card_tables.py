@@ -0,0 +1,20 @@
+"""
+Lookup tables for trick resolution and card values, built once at import.
+
+    WINNER[trump_suit][first][second] is True if the card played first wins the trick
+    VALUE[card] is the value returned by tools.get_card_value
+
+Cards and suits are the integers of cards.py, where POINTS[card] is the number of points of a card.
+"""
+
+from cards import CARDS, SUITS, first_wins
+
+# points plus a tiny rank-dependent value for the cards without points,
+# so that every rank of a suit has a different value
+RANK_VALUE = {'Ace': 11, '3': 10, 'King': 4, 'Horse': 3, 'Jack': 2,
+              '7': 0.0007, '6': 0.0006, '5': 0.0005, '4': 0.0004, '2': 0.0002}
+VALUE = [RANK_VALUE[rank] for rank, suit in CARDS]
+
+WINNER = [[[first_wins(first, second, trump_suit) for second in range(40)]
+           for first in range(40)]
+          for trump_suit in range(len(SUITS))]
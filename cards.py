@@ -0,0 +1,80 @@
+"""
+Integer encoding of the 40 Briscola cards.
+
+Each card is an integer 0..39, equal to its position in `Briscola.full_deck`,
+so card = rank * 4 + suit. Sets of cards (hands, taken piles, the deck) are
+stored as bitmasks where bit i is set if card i is in the set.
+"""
+
+RANKS = ['Ace', '2', '3', '4', '5', '6', '7', 'Jack', 'Horse', 'King']
+SUITS = ['Bastoni', 'Denari', 'Spade', 'Coppe']
+
+# same order as Briscola.full_deck
+CARDS = [(rank, suit) for rank in RANKS for suit in SUITS]
+CARD_INDEX = {card: i for i, card in enumerate(CARDS)}
+
+RANK_OF = [i // 4 for i in range(40)]
+SUIT_OF = [i % 4 for i in range(40)]
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+
+# points scored by each rank
+RANK_POINTS = {'Ace': 11, '3': 10, 'King': 4, 'Horse': 3, 'Jack': 2,
+               '7': 0, '6': 0, '5': 0, '4': 0, '2': 0}
+POINTS = [RANK_POINTS[rank] for rank, suit in CARDS]
+
+# strength of each rank inside a suit, the highest wins the trick
+RANK_STRENGTH = {'2': 0, '4': 1, '5': 2, '6': 3, '7': 4,
+                 'Jack': 5, 'Horse': 6, 'King': 7, '3': 8, 'Ace': 9}
+STRENGTH = [RANK_STRENGTH[rank] for rank, suit in CARDS]
+
+FULL_MASK = (1 << 40) - 1
+
+
+def card_to_index(card):
+    """Return the integer of a (rank, suit) card."""
+    return CARD_INDEX[card]
+
+
+def index_to_card(index):
+    """Return the (rank, suit) tuple of an integer card."""
+    return CARDS[index]
+
+
+def cards_to_mask(cards):
+    """Return the bitmask of a list of (rank, suit) cards."""
+    mask = 0
+    for card in cards:
+        mask |= 1 << CARD_INDEX[card]
+    return mask
+
+
+def mask_to_indices(mask):
+    """Return the integer cards in a bitmask, in deck order."""
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+def mask_to_cards(mask):
+    """Return the (rank, suit) cards in a bitmask, in deck order."""
+    return [CARDS[i] for i in mask_to_indices(mask)]
+
+
+def mask_points(mask):
+    """Return the points of the cards in a bitmask."""
+    return sum(POINTS[i] for i in mask_to_indices(mask))
+
+
+def first_wins(first, second, trump_suit):
+    """
+    Returns True if the integer card played first wins the trick against the second one
+    """
+    first_suit = SUIT_OF[first]
+    second_suit = SUIT_OF[second]
+    if first_suit == second_suit:
+        return STRENGTH[first] > STRENGTH[second]
+    # a trump beats any other suit, otherwise the first card wins
+    return second_suit != trump_suit
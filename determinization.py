@@ -0,0 +1,121 @@
+"""
+Sampling of determinizations: the possible hands of the opponent and orders of the
+deck, given what the player to move has seen.
+
+The sampler looks at the state once per decision: the unseen cards are found as a
+bitmask and kept as an array of card indices, and the determinizations are then
+drawn n at a time with NumPy. The briscola is the last card of the deck, or in the
+opponent's hand if the deck is over. Cards can be excluded from the opponent's hand
+or weighted by how likely the opponent is to hold them, see evidence_weights.
+"""
+
+import numpy as np
+
+from cards import CARDS, CARD_INDEX, FULL_MASK, POINTS, SUIT_INDEX, SUIT_OF, cards_to_mask, mask_to_indices
+from card_tables import WINNER
+
+
+class DeterminizationSampler:
+    """
+    Sampler of the determinizations of state seen from player, the player to move if not given.
+    exclude: cards the opponent cannot hold, they go to the deck unless there is no room.
+    weights: dictionary card -> relative likelihood that the opponent holds it, 1 if missing.
+    seed: seed of the NumPy generator, or a numpy.random.Generator.
+    """
+
+    def __init__(self, state, exclude=(), weights=None, seed=None, player=None):
+        self.state = state
+        self.player = player or state['player']
+        hand = state['hand' + str(self.player)]
+        seen = cards_to_mask(hand + state['table'] + state['taken1'] + state['taken2'])
+        self.briscola = CARD_INDEX[state['briscola']]
+        self.unseen_mask = FULL_MASK & ~seen & ~(1 << self.briscola)
+        self.unseen = np.array(mask_to_indices(self.unseen_mask), dtype=np.int64)
+
+        # the opponent has as many cards as the player, one less if they already played on the table
+        # and one more if the player did
+        if self.player == state['player']:
+            self.n_opponent = len(hand) - len(state['table'])
+        else:
+            self.n_opponent = len(hand) + len(state['table'])
+        briscola_unseen = not seen >> self.briscola & 1
+        # the deck is over and the opponent drew the briscola
+        self.briscola_in_hand = briscola_unseen and len(self.unseen) < self.n_opponent
+        self.briscola_in_deck = briscola_unseen and not self.briscola_in_hand
+        # the cards of the hand that are drawn from the unseen ones
+        self.n_drawn = self.n_opponent - self.briscola_in_hand
+
+        self.weights = np.ones(len(self.unseen))
+        for card, weight in (weights or {}).items():
+            i = self.position(card)
+            if i is not None:
+                self.weights[i] = weight
+        for card in exclude:
+            i = self.position(card)
+            if i is not None:
+                self.weights[i] = 0
+        self.uniform = bool((self.weights == 1).all())
+        self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    def position(self, card):
+        """Return the position of card in self.unseen, None if it was seen."""
+        i = CARD_INDEX[card]
+        if not self.unseen_mask >> i & 1:
+            return None
+        return int(np.searchsorted(self.unseen, i))
+
+    def unseen_cards(self):
+        """Return the cards the player has not seen, without the briscola."""
+        return [CARDS[i] for i in self.unseen]
+
+    def sample_indices(self, n):
+        """
+        Return n determinizations as two arrays of card indices: the hands of the opponent (n, H)
+        and the decks (n, D), in drawing order with the briscola last if it is still in the deck.
+        """
+        if self.uniform:
+            order = self.rng.permuted(np.tile(self.unseen, (n, 1)), axis=1)
+        else:
+            # weighted sampling without replacement (Efraimidis and Spirakis): the cards with
+            # the highest keys u ** (1 / w) go to the hand, and the rest are shuffled into the deck
+            with np.errstate(divide='ignore'):
+                keys = np.log(self.rng.random((n, len(self.unseen)))) / self.weights
+            order = self.unseen[np.argsort(-keys, axis=1)]
+            order[:, self.n_drawn:] = self.rng.permuted(order[:, self.n_drawn:], axis=1)
+        hands = order[:, :self.n_drawn]
+        deck = order[:, self.n_drawn:]
+        if self.briscola_in_hand:
+            hands = np.concatenate([hands, np.full((n, 1), self.briscola)], axis=1)
+        if self.briscola_in_deck:
+            deck = np.concatenate([deck, np.full((n, 1), self.briscola)], axis=1)
+        return hands, deck
+
+    def sample(self, n=1):
+        """Return n determinized copies of the state, as tools.determinize. The deck of a
+        state is drawn from its end, in the same order as the arrays of sample_indices, and
+        does not hold the briscola, which draw_cards hands out when the deck is over."""
+        hands, decks = self.sample_indices(n)
+        if self.briscola_in_deck:
+            decks = decks[:, :-1]
+        opponent = 'hand' + str(3 - self.player)
+        states = []
+        for hand, deck in zip(hands.tolist(), decks.tolist()):
+            state = {key: (list(value) if isinstance(value, list) else value) for key, value in self.state.items()}
+            state[opponent] = [CARDS[i] for i in hand]
+            state['deck'] = [CARDS[i] for i in reversed(deck)]
+            states.append(state)
+        return states
+
+
+def evidence_weights(lead, answer, briscola, unseen, weight=0.5):
+    """
+    Return the weights of a DeterminizationSampler from the last trick, where the opponent
+    answered the card lead with answer. An opponent who lost a trick with a card worth points
+    probably had no card without points to throw away: the unseen cards without points
+    that are not briscole get weight. Return an empty dictionary if there is no such evidence.
+    """
+    trump = SUIT_INDEX[briscola[1]]
+    first, second = CARD_INDEX[lead], CARD_INDEX[answer]
+    if not WINNER[trump][first][second] or POINTS[second] == 0:
+        return {}
+    return {card: weight for card in unseen if POINTS[CARD_INDEX[card]] == 0 and SUIT_OF[CARD_INDEX[card]] != trump}
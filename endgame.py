@@ -0,0 +1,174 @@
+"""
+Perfect-information solver for the Briscola endgame, once the deck is empty.
+
+Both hands are known, so the rest of the game is a deterministic two-player
+zero-sum game. The solver runs a negamax alpha-beta search on the bitmask
+hands of cards.py and returns exact point differentials. Positions reached
+through different card orders are found again in a transposition table keyed
+by a Zobrist hash of the hands, the card on the table, the player to move and
+the trump suit.
+"""
+
+import random
+from cards import CARD_INDEX, CARDS, POINTS, STRENGTH, SUIT_OF, SUIT_INDEX, cards_to_mask, mask_to_indices, mask_points
+from card_tables import WINNER
+
+# Zobrist keys, from a fixed seed so that hashes are the same in every process
+_rng = random.Random(2023)
+HAND_KEYS = [None, [_rng.getrandbits(64) for _ in range(40)], [_rng.getrandbits(64) for _ in range(40)]]
+LEAD_KEYS = [_rng.getrandbits(64) for _ in range(40)]
+PLAYER_KEY = _rng.getrandbits(64)
+TRUMP_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+
+# bounds of the values stored in the transposition table
+EXACT, LOWER, UPPER = 0, 1, 2
+# larger than any point differential
+INFINITY = 1000
+
+
+def zobrist_key(hand1, hand2, lead, player, trump_suit):
+    """Return the Zobrist hash of a position, lead is -1 if the table is empty."""
+    key = TRUMP_KEYS[trump_suit]
+    for card in mask_to_indices(hand1):
+        key ^= HAND_KEYS[1][card]
+    for card in mask_to_indices(hand2):
+        key ^= HAND_KEYS[2][card]
+    if lead >= 0:
+        key ^= LEAD_KEYS[lead]
+    if player == 2:
+        key ^= PLAYER_KEY
+    return key
+
+
+class EndgameSolver:
+    """
+    Solves endgames exactly, with a transposition table kept between calls.
+
+    The value of a position is the difference between the points that the
+    player to move and the opponent will take from now to the end of the game.
+    The table only depends on the cards still in play, so the same solver can
+    be reused for every endgame, also across games.
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.nodes = 0
+
+    def clear(self):
+        """Empty the transposition table."""
+        self.table.clear()
+
+    def order_moves(self, hand, lead, trump_suit, hint):
+        """
+        Return the cards of hand, most promising first.
+        Leading, the cheapest cards come first. Following, the tricks taken
+        with the most points come first and the tricks lost with the most points last.
+        """
+        cards = mask_to_indices(hand)
+        if lead < 0:
+            cards.sort(key=lambda c: (POINTS[c], SUIT_OF[c] == trump_suit, STRENGTH[c]))
+        else:
+            winner = WINNER[trump_suit][lead]
+            lead_points = POINTS[lead]
+            cards.sort(key=lambda c: lead_points + POINTS[c] if winner[c] else -lead_points - POINTS[c])
+        if hint in cards:
+            cards.remove(hint)
+            cards.insert(0, hint)
+        return cards
+
+    def negamax(self, hand1, hand2, lead, player, trump_suit, alpha, beta, key):
+        """Return the value of the position for player, exact if it is inside (alpha, beta)."""
+        if not hand1 and not hand2:
+            return 0
+        self.nodes += 1
+
+        hint = None
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag, hint = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER and value >= beta:
+                return value
+            if flag == UPPER and value <= alpha:
+                return value
+
+        alpha_orig = alpha
+        best_value = -INFINITY
+        best_move = None
+        for card in self.order_moves(hand1 if player == 1 else hand2, lead, trump_suit, hint):
+            bit = 1 << card
+            if player == 1:
+                new_hand1, new_hand2 = hand1 ^ bit, hand2
+            else:
+                new_hand1, new_hand2 = hand1, hand2 ^ bit
+            new_key = key ^ HAND_KEYS[player][card]
+
+            if lead < 0:
+                # the opponent answers
+                v = -self.negamax(new_hand1, new_hand2, card, 3 - player, trump_suit, -beta, -alpha,
+                                  new_key ^ LEAD_KEYS[card] ^ PLAYER_KEY)
+            else:
+                points = POINTS[lead] + POINTS[card]
+                new_key ^= LEAD_KEYS[lead]
+                if WINNER[trump_suit][lead][card]:
+                    # the opponent takes the trick and leads the next one
+                    v = -points - self.negamax(new_hand1, new_hand2, -1, 3 - player, trump_suit,
+                                               -beta - points, -alpha - points, new_key ^ PLAYER_KEY)
+                else:
+                    # the player takes the trick and leads the next one
+                    v = points + self.negamax(new_hand1, new_hand2, -1, player, trump_suit,
+                                              alpha - points, beta - points, new_key)
+
+            if v > best_value:
+                best_value = v
+                best_move = card
+            alpha = max(alpha, v)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (best_value, flag, best_move)
+        return best_value
+
+    def move_values(self, state):
+        """
+        Return a dictionary of the final point differential (player to move minus opponent)
+        reached by each move of the player to move, with perfect play afterwards.
+        The state is a Briscola state with an empty deck.
+        """
+        if state['deck']:
+            raise ValueError("The endgame solver needs an empty deck")
+        player = state['player']
+        trump_suit = SUIT_INDEX[state['briscola'][1]]
+        hand1 = cards_to_mask(state['hand1'])
+        hand2 = cards_to_mask(state['hand2'])
+        lead = CARD_INDEX[state['table'][0]] if state['table'] else -1
+        # points already taken
+        taken = mask_points(cards_to_mask(state['taken' + str(player)])) - mask_points(cards_to_mask(state['taken' + str(3 - player)]))
+
+        values = {}
+        for card in self.order_moves(hand1 if player == 1 else hand2, lead, trump_suit, None):
+            bit = 1 << card
+            new_hand1, new_hand2 = (hand1 ^ bit, hand2) if player == 1 else (hand1, hand2 ^ bit)
+            if lead < 0:
+                v = -self.negamax(new_hand1, new_hand2, card, 3 - player, trump_suit, -INFINITY, INFINITY,
+                                  zobrist_key(new_hand1, new_hand2, card, 3 - player, trump_suit))
+            else:
+                points = POINTS[lead] + POINTS[card]
+                winner = 3 - player if WINNER[trump_suit][lead][card] else player
+                v = self.negamax(new_hand1, new_hand2, -1, winner, trump_suit, -INFINITY, INFINITY,
+                                 zobrist_key(new_hand1, new_hand2, -1, winner, trump_suit))
+                v = points + v if winner == player else -points - v
+            values[CARDS[card]] = taken + v
+        return values
+
+    def best_move(self, state):
+        """Return the move with the best final point differential for the player to move."""
+        values = self.move_values(state)
+        return max(values, key=values.get)
@@ -0,0 +1,165 @@
+from games4e import Game
+from briscola_game import Briscola
+from cards import CARD_INDEX, CARDS, cards_to_mask, mask_to_cards, mask_to_indices, mask_points, SUIT_OF
+from card_tables import WINNER
+
+
+class BriscolaState:
+    """
+    Compact Briscola state where every card is an integer 0..39 (see cards.py).
+
+    The hands and the taken piles are bitmasks, the table is a tuple of at most
+    two cards, the player to move is 1 or 2 and the briscola is a single card.
+    The deck is a tuple of cards drawn from its end, in the same order as the
+    deck of the dictionary state. All fields are immutable ints or tuples, so a
+    copy is O(1).
+    """
+
+    __slots__ = ('hand1', 'hand2', 'table', 'player', 'taken1', 'taken2', 'briscola', 'deck')
+
+    def __init__(self, hand1=0, hand2=0, table=(), player=1, taken1=0, taken2=0, briscola=0, deck=()):
+        self.hand1 = hand1
+        self.hand2 = hand2
+        self.table = table
+        self.player = player
+        self.taken1 = taken1
+        self.taken2 = taken2
+        self.briscola = briscola
+        self.deck = deck
+
+    def copy(self):
+        """Return a copy of the state."""
+        return BriscolaState(self.hand1, self.hand2, self.table, self.player,
+                             self.taken1, self.taken2, self.briscola, self.deck)
+
+    def hand(self, player):
+        """Return the bitmask of the hand of player."""
+        return self.hand1 if player == 1 else self.hand2
+
+    def taken(self, player):
+        """Return the bitmask of the cards taken by player."""
+        return self.taken1 if player == 1 else self.taken2
+
+    @classmethod
+    def from_dict(cls, state):
+        """Build a compact state from the dictionary state used by Briscola."""
+        return cls(hand1=cards_to_mask(state['hand1']),
+                   hand2=cards_to_mask(state['hand2']),
+                   table=tuple(CARD_INDEX[card] for card in state['table']),
+                   player=state['player'],
+                   taken1=cards_to_mask(state['taken1']),
+                   taken2=cards_to_mask(state['taken2']),
+                   briscola=CARD_INDEX[state['briscola']],
+                   deck=tuple(CARD_INDEX[card] for card in state['deck']))
+
+    def to_dict(self):
+        """
+        Return the dictionary state used by Briscola.
+        Hands and taken piles are sets, so their cards are listed in the order of cards.CARDS;
+        the deck keeps its order.
+        """
+        return {'hand1': mask_to_cards(self.hand1),
+                'hand2': mask_to_cards(self.hand2),
+                'table': [CARDS[card] for card in self.table],
+                'player': self.player,
+                'taken1': mask_to_cards(self.taken1),
+                'taken2': mask_to_cards(self.taken2),
+                'briscola': CARDS[self.briscola],
+                'deck': [CARDS[card] for card in self.deck]}
+
+    def __eq__(self, other):
+        return isinstance(other, BriscolaState) and all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, slot) for slot in self.__slots__))
+
+    def __repr__(self):
+        return 'BriscolaState({})'.format(self.to_dict())
+
+
+class FastBriscola(Game):
+    """
+    Same rules as Briscola, played on BriscolaState instead of the dictionary state.
+    Moves are integer cards. Use BriscolaState.from_dict and to_dict to move
+    between the two representations.
+    """
+
+    def __init__(self, initial=None, utility='win'):
+        self.initial = BriscolaState.from_dict(initial if initial is not None else Briscola.new_game())
+        # the players expect dictionary states and a Briscola game
+        self.dict_game = Briscola(utility=utility)
+        self.utility_function = self.dict_game.utility_function
+
+    def actions(self, state):
+        """Return a list of the allowable moves at this point."""
+        return mask_to_indices(state.hand1 if state.player == 1 else state.hand2)
+
+    def result(self, state, move):
+        """Return the state that results from making a move from a state."""
+        new_state = state.copy()
+        bit = 1 << move
+        if new_state.player == 1:
+            new_state.hand1 &= ~bit
+        else:
+            new_state.hand2 &= ~bit
+        new_state.table = new_state.table + (move,)
+
+        # if there is only one card on the table, the player to move is changed
+        if len(new_state.table) == 1:
+            new_state.player = 3 - new_state.player
+            return new_state
+
+        # if the first card wins, the player that had just moved loses the trick
+        first, second = new_state.table
+        if WINNER[SUIT_OF[new_state.briscola]][first][second]:
+            winner = 3 - new_state.player
+        else:
+            winner = new_state.player
+
+        # each player draws a card from the end of the deck, player 1 first,
+        # and when the deck is over the second card is the briscola
+        deck = new_state.deck
+        if deck:
+            card1 = deck[-1]
+            card2 = deck[-2] if len(deck) > 1 else new_state.briscola
+            new_state.deck = deck[:-2]
+            new_state.hand1 |= 1 << card1
+            new_state.hand2 |= 1 << card2
+
+        trick = (1 << first) | (1 << second)
+        if winner == 1:
+            new_state.taken1 |= trick
+        else:
+            new_state.taken2 |= trick
+        new_state.table = ()
+        new_state.player = winner
+        return new_state
+
+    def points(self, state, player):
+        """Return the points taken by player."""
+        return mask_points(state.taken(player))
+
+    def utility(self, state, player):
+        """Return the value of this final state to player."""
+        # the same utility as Briscola.utility, a 60-60 draw is worth 0.5 with the default one
+        return self.utility_function.of_points(mask_points(state.taken(player)))
+
+    def terminal_test(self, state):
+        """Return True if this is a final state for the game."""
+        return (state.taken1 | state.taken2).bit_count() == 40
+
+    def to_move(self, state):
+        """Return the player whose move it is in this state."""
+        return state.player
+
+    def play_game(self, player1, player2):
+        """
+        Play a game from self.initial and return the final state.
+        The players receive dictionary states, as in Briscola.play_game.
+        """
+        state = self.initial
+        while not self.terminal_test(state):
+            player = player1 if state.player == 1 else player2
+            move = player.generate_move(state.to_dict(), self.dict_game)
+            state = self.result(state, CARD_INDEX[move])
+        return state
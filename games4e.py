@@ -2,13 +2,21 @@
 
 import copy
 import itertools
+import math
 import random
+import threading
+import time
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy as np
 
-from utils4e import vector_add, MCT_Node, ucb
-from tools import evaluate_move, generate_move_smart
+from utils4e import vector_add, MCT_Node, search_iterations
+from mct_tree import MCT_Tree
+from tools import copy_state, evaluate_move, generate_move_smart, leaf_values, player_values, playout, playout_inplace, shuffle_deck
+from tree_policies import UCB1
+from search_stats import SearchStats, CountingGame
+from utilities import make_utility
 
 GameState = namedtuple('GameState', 'to_move, utility, board, moves')
 StochasticGameState = namedtuple('StochasticGameState', 'to_move, utility, board, moves, chance')
@@ -87,30 +95,43 @@ def expect_minmax(state, game):
     return max(game.actions(state), key=lambda a: chance_node(state, a), default=None)
 
 
-def alpha_beta_search(state, game):
+def alpha_beta_search(state, game, stats=None, utility=None):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    If stats is a search_stats.SearchStats, the nodes searched, calls to result,
+    depth and time are counted into it. utility replaces game.utility if given,
+    a name or a Utility of utilities.py."""
 
     player = game.to_move(state)
+    utility = make_utility(utility) or game.utility
+    if stats is not None:
+        game = CountingGame(game, stats)
+        start = time.perf_counter()
 
     # Functions used by alpha_beta
-    def max_value(state, alpha, beta):
+    def max_value(state, alpha, beta, depth):
         if game.terminal_test(state):
-            return game.utility(state, player)
+            return utility(state, player)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
         v = -np.inf
         for a in game.actions(state):
-            v = max(v, min_value(game.result(state, a), alpha, beta))
+            v = max(v, min_value(game.result(state, a), alpha, beta, depth + 1))
             if v >= beta:
                 return v
             alpha = max(alpha, v)
         return v
 
-    def min_value(state, alpha, beta):
+    def min_value(state, alpha, beta, depth):
         if game.terminal_test(state):
-            return game.utility(state, player)
+            return utility(state, player)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
         v = np.inf
         for a in game.actions(state):
-            v = min(v, max_value(game.result(state, a), alpha, beta))
+            v = min(v, max_value(game.result(state, a), alpha, beta, depth + 1))
             if v <= alpha:
                 return v
             beta = min(beta, v)
@@ -121,23 +142,35 @@ def alpha_beta_search(state, game):
     beta = np.inf
     best_action = None
     for a in game.actions(state):
-        v = min_value(game.result(state, a), best_score, beta)
+        v = min_value(game.result(state, a), best_score, beta, 1)
         if v > best_score:
             best_score = v
             best_action = a
+    if stats is not None:
+        stats.total_time += time.perf_counter() - start
     return best_action
 
 
-def alpha_beta_cutoff_search(state, game, d = 12, cutoff_test=None, eval_fn=None):
+def alpha_beta_cutoff_search(state, game, d = 12, cutoff_test=None, eval_fn=None, stats=None, utility=None):
     """Search game to determine best action; use alpha-beta pruning.
-    This version cuts off search and uses an evaluation function."""
+    This version cuts off search and uses an evaluation function, by default the
+    utility of the final states and tools.heuristic_value of the others, for utility
+    (a name or a Utility of utilities.py) or the utility of game.
+    If stats is a search_stats.SearchStats, the nodes searched, calls to result,
+    depth and time are counted into it."""
 
     player = game.to_move(state)
+    if stats is not None:
+        game = CountingGame(game, stats)
+        start = time.perf_counter()
 
     # Functions used by alpha_beta
     def max_value(state, alpha, beta, depth):
         if cutoff_test(state, depth):
             return eval_fn(state)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
         v = -np.inf
         for a in game.actions(state):
             v = max(v, min_value(game.result(state, a), alpha, beta, depth + 1))
@@ -149,6 +182,9 @@ def alpha_beta_cutoff_search(state, game, d = 12, cutoff_test=None, eval_fn=None
     def min_value(state, alpha, beta, depth):
         if cutoff_test(state, depth):
             return eval_fn(state)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
         v = np.inf
         for a in game.actions(state):
             v = min(v, max_value(game.result(state, a), alpha, beta, depth + 1))
@@ -160,7 +196,8 @@ def alpha_beta_cutoff_search(state, game, d = 12, cutoff_test=None, eval_fn=None
     # Body of alpha_beta_cutoff_search starts here:
     # The default test cuts off at depth d or at a terminal state
     cutoff_test = (cutoff_test or (lambda state, depth: depth > d or game.terminal_test(state)))
-    eval_fn = eval_fn or (lambda state: game.utility(state, player))
+    utility = make_utility(utility)
+    eval_fn = eval_fn or (lambda state: leaf_values([state], game, [player], utility=utility)[0])
     best_score = -np.inf
     beta = np.inf
     best_action = None
@@ -169,19 +206,192 @@ def alpha_beta_cutoff_search(state, game, d = 12, cutoff_test=None, eval_fn=None
         if v > best_score:
             best_score = v
             best_action = a
+    if stats is not None:
+        stats.total_time += time.perf_counter() - start
+    return best_action
+
+
+def alpha_beta_search_inplace(state, game, stats=None, utility=None):
+    """Same as alpha_beta_search, but moves are made and taken back on a
+    single copy of the state with game.apply and game.undo."""
+
+    player = game.to_move(state)
+    utility = make_utility(utility) or game.utility
+    state = copy.deepcopy(state)
+    if stats is not None:
+        game = CountingGame(game, stats)
+        start = time.perf_counter()
+
+    def value(a, alpha, beta, depth, next_value):
+        token = game.apply(state, a)
+        v = next_value(alpha, beta, depth)
+        game.undo(state, token)
+        return v
+
+    # Functions used by alpha_beta
+    def max_value(alpha, beta, depth):
+        if game.terminal_test(state):
+            return utility(state, player)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
+        v = -np.inf
+        for a in list(game.actions(state)):
+            v = max(v, value(a, alpha, beta, depth + 1, min_value))
+            if v >= beta:
+                return v
+            alpha = max(alpha, v)
+        return v
+
+    def min_value(alpha, beta, depth):
+        if game.terminal_test(state):
+            return utility(state, player)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
+        v = np.inf
+        for a in list(game.actions(state)):
+            v = min(v, value(a, alpha, beta, depth + 1, max_value))
+            if v <= alpha:
+                return v
+            beta = min(beta, v)
+        return v
+
+    # Body of alpha_beta_search_inplace:
+    best_score = -np.inf
+    beta = np.inf
+    best_action = None
+    for a in list(game.actions(state)):
+        v = value(a, best_score, beta, 1, min_value)
+        if v > best_score:
+            best_score = v
+            best_action = a
+    if stats is not None:
+        stats.total_time += time.perf_counter() - start
+    return best_action
+
+
+def alpha_beta_cutoff_search_inplace(state, game, d=12, cutoff_test=None, eval_fn=None, stats=None, utility=None):
+    """Same as alpha_beta_cutoff_search, but moves are made and taken back on a
+    single copy of the state with game.apply and game.undo."""
+
+    player = game.to_move(state)
+    state = copy.deepcopy(state)
+    if stats is not None:
+        game = CountingGame(game, stats)
+        start = time.perf_counter()
+
+    def value(a, alpha, beta, depth, next_value):
+        token = game.apply(state, a)
+        v = next_value(alpha, beta, depth)
+        game.undo(state, token)
+        return v
+
+    # Functions used by alpha_beta
+    def max_value(alpha, beta, depth):
+        if cutoff_test(state, depth):
+            return eval_fn(state)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
+        v = -np.inf
+        for a in list(game.actions(state)):
+            v = max(v, value(a, alpha, beta, depth + 1, min_value))
+            if v >= beta:
+                return v
+            alpha = max(alpha, v)
+        return v
+
+    def min_value(alpha, beta, depth):
+        if cutoff_test(state, depth):
+            return eval_fn(state)
+        if stats is not None:
+            stats.nodes_expanded += 1
+            stats.reach(depth)
+        v = np.inf
+        for a in list(game.actions(state)):
+            v = min(v, value(a, alpha, beta, depth + 1, max_value))
+            if v <= alpha:
+                return v
+            beta = min(beta, v)
+        return v
+
+    # Body of alpha_beta_cutoff_search_inplace starts here:
+    # The default test cuts off at depth d or at a terminal state
+    cutoff_test = (cutoff_test or (lambda state, depth: depth > d or game.terminal_test(state)))
+    utility = make_utility(utility)
+    eval_fn = eval_fn or (lambda state: leaf_values([state], game, [player], utility=utility)[0])
+    best_score = -np.inf
+    beta = np.inf
+    best_action = None
+    for a in list(game.actions(state)):
+        v = value(a, best_score, beta, 1, min_value)
+        if v > best_score:
+            best_score = v
+            best_action = a
+    if stats is not None:
+        stats.total_time += time.perf_counter() - start
     return best_action
 
 
 # ______________________________________________________________________________
 # Monte Carlo Tree Search
-def monte_carlo_tree_search(state, game, N=1000):
+def monte_carlo_tree_search(state, game, N=1000, time_limit_ms=None, info=None, root=None, C=1.4,
+                            n_workers=1, parallel='root', executor=None, virtual_loss=1, stats=None, rollout=None,
+                            cutoff=None, evaluator=None, leaf_batch=1, utility=None):
+    """Run N iterations, or as many as fit in time_limit_ms if it is given.
+    C is the exploration constant of the UCB. rollout is the rollout policy of the
+    simulations, generate_move_smart if not given (see playout_policies). A node keeps
+    the draws made when it was expanded, each simulation shuffles the deck left again.
+    With cutoff, the simulations stop after cutoff tricks and the states reached are valued
+    by evaluator (see value_network, tools.heuristic_evaluator by default). leaf_batch leaves are then selected before their
+    simulations are played and evaluated in one call, each one adding virtual_loss to
+    its path so that the next ones look elsewhere. utility is the utility of the playouts
+    (a name or a Utility of utilities.py), the one of game if not given. The U of a node
+    is the total utility for the player that made its move.
+    If info is a dictionary, the number of iterations run is stored in info['iterations']
+    and the root of the tree in info['root']. A node of an earlier tree can be passed as
+    root to go on searching from it, see rebase_tree.
+
+    With n_workers > 1 the search runs on several cores, with parallel set to:
+    'root': n_workers independent trees of N iterations each are searched in the processes
+        of executor (a concurrent.futures.ProcessPoolExecutor, created for this call if not
+        given), and the visits of the moves at their roots are added up. root is not used,
+        info['root'] is None and info['visits'] has the merged visits of each move.
+    'tree': n_workers threads share one tree and run N iterations in total. A thread adds
+        virtual_loss visits without utility to the nodes it goes through, so that the other
+        threads look elsewhere until it backpropagates. The threads only run at the same time
+        during the playouts, and only on a free-threaded (no GIL) build of Python.
+
+    If stats is a search_stats.SearchStats, the nodes expanded, rollouts, calls to result,
+    depth and time of each phase are counted into it, and the visits and utility of each
+    move at the root are stored in stats.root_scores."""
+    if n_workers > 1 and parallel == 'root':
+        return root_parallel_search(state, game, N, time_limit_ms, info, C, n_workers, executor, stats, rollout,
+                                    cutoff, evaluator, leaf_batch, utility)
+    rollout = rollout or generate_move_smart
+    utility = make_utility(utility)
+
+    if stats is not None:
+        # the threads play their playouts outside the lock of the tree
+        game = CountingGame(game, stats, threading.Lock() if n_workers > 1 else None)
+        search_start = time.perf_counter()
+
+    lock = threading.Lock()
+    vl = virtual_loss if n_workers > 1 or leaf_batch > 1 else 0
+
     def select(n):
         # print("SELECT")
-        """select a leaf node in the tree"""
-        if n.children:
-            return select(max(n.children.keys(), key=ucb))
-        else:
-            return n
+        """select a leaf node in the tree, with the UCB of utils4e.ucb and the exploration
+        term of the parent computed once per level. A node has at most 3 children:
+        scoring them with NumPy, as the tree policies of monte_carlo_tree_search_pool do
+        over the arrays of MCT_Tree, costs about 5 times more than these scalar calls"""
+        while n.children:
+            explore = C * math.sqrt(math.log(n.N)) if n.N > 0 else 0.0
+            n = max(n.children.keys(),
+                    key=lambda child: math.inf if child.N == 0 else child.U / child.N + explore / math.sqrt(child.N))
+            n.N += vl
+        return n
 
     def expand(n):
         # print("EXPAND")
@@ -189,46 +399,281 @@ def monte_carlo_tree_search(state, game, N=1000):
         if not n.children and not game.terminal_test(n.state):
             n.children = {MCT_Node(state=game.result(n.state, action), parent=n): action
                           for action in game.actions(n.state)}
+            if stats is not None:
+                stats.nodes_expanded += 1
         return select(n)
 
-    def simulate(game, state):
-        """simulate the utility of current state by random picking a step"""
-        # print("START SIM")
-        player = game.to_move(state)
-        while not game.terminal_test(state):
-            # print("The state is: ", state)
-            action = generate_move_smart(state, game)
-            # print("The action is: ", action)
-            state = game.result(state, action)
-            # print("The new state is: ", state)
-        v = game.utility(state, player)
-        return -v
-
-    def backprop(n, utility):
-        """passing the utility back to all parent nodes"""
-        if utility > 0:
-            n.U += utility
-        # if utility == 0:
-        #     n.U += 0.5
-        n.N += 1
-        if n.parent:
-            backprop(n.parent, -utility)
-
-    root = MCT_Node(state=state)
-
-    for _ in range(N):
-        leaf = select(root)
-        child = expand(leaf)
-        result = simulate(game, child.state)
-        backprop(child, result)
+    def simulate(leaves):
+        """simulate the utility of the states of leaves with the rollout policy, evaluated together,
+        and return the utilities of player 1 and 2 for each leaf"""
+        # each playout draws from its own shuffle of the deck left at the leaf
+        ends = [playout(shuffle_deck(copy_state(n.state)), game, rollout, cutoff) for n in leaves]
+        return player_values(ends, game, evaluator, utility)
+
+    def backprop(n, values):
+        """passing the utility back to all parent nodes, each one gets the utility
+        of the player that made its move"""
+        while n is not None:
+            if n.parent is not None:
+                n.U += values[game.to_move(n.parent.state)]
+            # the visit replaces the virtual loss
+            n.N += 1 - vl
+            n = n.parent
+
+    def simulate_backprop(leaves):
+        """simulate the leaves and backpropagate their utilities"""
+        if stats is None:
+            results = simulate(leaves)
+            with lock:
+                for child, result in zip(leaves, results):
+                    backprop(child, result)
+            return
+        start = time.perf_counter()
+        results = simulate(leaves)
+        end = time.perf_counter()
+        # the threads of tree parallelization count into the same stats
+        with lock:
+            stats.time['simulate'] += end - start
+            stats.rollouts += len(leaves)
+            start = time.perf_counter()
+            for child, result in zip(leaves, results):
+                backprop(child, result)
+            stats.add_time('backprop', start)
+
+    def search(n_iterations):
+        """run the iterations of one thread and return how many there were"""
+        iterations = 0
+        leaves = []
+        for _ in search_iterations(n_iterations, time_limit_ms):
+            if stats is None:
+                with lock:
+                    root.N += vl
+                    leaf = select(root)
+                    leaves.append(expand(leaf))
+            else:
+                # the same iteration, timing each phase
+                start = time.perf_counter()
+                with lock:
+                    root.N += vl
+                    leaf = select(root)
+                    start = stats.add_time('select', start)
+                    child = expand(leaf)
+                    stats.add_time('expand', start)
+                    stats.reach(node_depth(child))
+                leaves.append(child)
+            iterations += 1
+            if len(leaves) == leaf_batch:
+                simulate_backprop(leaves)
+                leaves = []
+        if leaves:
+            simulate_backprop(leaves)
+        return iterations
+
+    if root is None:
+        root = MCT_Node(state=state)
+    else:
+        rebase_tree(root, state, game)
 
-    max_state = max(root.children, key=lambda p: p.N)
+    if n_workers > 1:
+        counts = [N // n_workers + (1 if i < N % n_workers else 0) for i in range(n_workers)]
+        with ThreadPoolExecutor(n_workers) as threads:
+            total = sum(threads.map(search, counts))
+    else:
+        total = search(N)
 
-    print("The scores are:", [child.N for child in root.children])
+    if info is not None:
+        info['iterations'] = total
+        info['root'] = root
+    if stats is not None:
+        stats.iterations += total
+        stats.root_scores = {move: (child.N, child.U) for child, move in root.children.items()}
+        stats.total_time += time.perf_counter() - search_start
 
+    max_state = max(root.children, key=lambda p: p.N)
     return root.children.get(max_state)
 
 
+def node_depth(n):
+    """Return the number of moves from the root of the tree to node n."""
+    depth = 0
+    while n.parent is not None:
+        n = n.parent
+        depth += 1
+    return depth
+
+
+def root_search_visits(state, game, N, time_limit_ms, C, seed, stats=None, rollout=None, cutoff=None, evaluator=None,
+                       leaf_batch=1, utility=None):
+    """Search state with its own tree and return the visits of each move at the root,
+    the number of iterations and stats. Runs in the worker processes of root_parallel_search."""
+    random.seed(seed)
+    info = {}
+    monte_carlo_tree_search(state, game, N, time_limit_ms, info, C=C, stats=stats, rollout=rollout, cutoff=cutoff,
+                            evaluator=evaluator, leaf_batch=leaf_batch, utility=utility)
+    visits = {move: child.N for child, move in info['root'].children.items()}
+    return visits, info['iterations'], stats
+
+
+def root_parallel_search(state, game, N, time_limit_ms, info, C, n_workers, executor=None, stats=None, rollout=None,
+                         cutoff=None, evaluator=None, leaf_batch=1, utility=None):
+    """Root parallelization of monte_carlo_tree_search: search n_workers independent trees in
+    processes and return the move with the most visits over all of them. The statistics of
+    the processes are merged into stats, the time of their phases is added up."""
+    start = time.perf_counter()
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(n_workers)
+    try:
+        futures = [executor.submit(root_search_visits, state, game, N, time_limit_ms, C, random.getrandbits(64),
+                                   None if stats is None else SearchStats(), rollout, cutoff, evaluator, leaf_batch,
+                                   utility)
+                   for _ in range(n_workers)]
+        visits, total = {}, 0
+        for future in futures:
+            tree_visits, iterations, tree_stats = future.result()
+            for move, n in tree_visits.items():
+                visits[move] = visits.get(move, 0) + n
+            total += iterations
+            if stats is not None:
+                stats.merge(tree_stats)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if info is not None:
+        info['iterations'] = total
+        info['root'] = None
+        info['visits'] = visits
+    if stats is not None:
+        stats.total_time += time.perf_counter() - start
+    return max(visits, key=visits.get)
+
+
+def rebase_tree(root, state, game):
+    """Make root the root of its tree for state, keeping the statistics of its subtree.
+    The states of the nodes are recomputed by replaying their moves from state: the
+    children of moves that are not legal anymore are dropped and the legal moves that
+    had no child get a new one, unless the node was never expanded."""
+    root.parent = None
+
+    def rebase(n, state):
+        n.state = state
+        if not n.children:
+            return
+        actions = game.actions(state)
+        for child, action in list(n.children.items()):
+            if action in actions:
+                rebase(child, game.result(state, action))
+            else:
+                del n.children[child]
+        for action in actions:
+            if action not in n.children.values():
+                n.children[MCT_Node(state=game.result(state, action), parent=n)] = action
+
+    rebase(root, state)
+
+
+def subtree(root, moves):
+    """Return the node reached from root by playing moves, None if it is not in the tree."""
+    n = root
+    for move in moves:
+        n = next((child for child, action in n.children.items() if action == move), None)
+        if n is None:
+            return None
+    return n
+
+
+def monte_carlo_tree_search_pool(state, game, N=1000, time_limit_ms=None, info=None, policy=None, rollout=None,
+                                 cutoff=None, evaluator=None, utility=None, stats=None):
+    """Monte Carlo tree search on a single copy of the state, moved along the
+    tree with game.apply and taken back with game.undo, with the tree stored in an
+    MCT_Tree. The nodes keep no state: every iteration shuffles the deck and replays
+    the moves from the root, so the draws are sampled again each time. The children of
+    a node are added for the moves that are legal the first time it is reached; later
+    replays only follow the ones that are still legal, and play out from the node if
+    there are none. The U of a node is the utility of the playouts for the player that
+    made its move. As in monte_carlo_tree_search, time_limit_ms replaces N.
+    Selection and backpropagation are loops, not recursive calls. policy is the
+    tree policy that picks the children (see tree_policies), UCB1 by default, and rollout
+    the rollout policy (see playout_policies), generate_move_smart by default. With cutoff
+    the playouts stop after cutoff tricks and are valued by evaluator, and utility replaces the one
+    of game, as in monte_carlo_tree_search.
+    If info is a dictionary, info['iterations'] and info['tree'] are set. stats is filled as in
+    monte_carlo_tree_search, the selection and the expansion are timed together as 'select'."""
+    state = copy.deepcopy(state)
+    tree = MCT_Tree()
+    policy = policy or UCB1()
+    rollout = rollout or generate_move_smart
+    utility = make_utility(utility)
+    if stats is not None:
+        game = CountingGame(game, stats)
+        search_start = time.perf_counter()
+
+    def select_expand(path, tokens):
+        """walk down the tree making the moves, stop after the first move of a new node"""
+        node = 0
+        while not game.terminal_test(state):
+            actions = game.actions(state)
+            if tree.n_children[node] == 0:
+                first = tree.add_children(node, actions, game.to_move(state), policy.priors(state, actions))
+                if stats is not None:
+                    stats.nodes_expanded += 1
+                i = random.randrange(len(actions))
+                path.append(first + i)
+                tokens.append(game.apply(state, actions[i]))
+                return
+            node = policy.select(tree, node, tree.legal_mask(actions))
+            if node < 0:
+                return
+            path.append(node)
+            tokens.append(game.apply(state, tree.moves[tree.move[node]]))
+
+    def simulate(tokens):
+        """play the game to the end, or to the cutoff, with the rollout policy"""
+        tokens.extend(playout_inplace(state, game, rollout, cutoff))
+        if stats is not None:
+            stats.rollouts += 1
+
+    def backprop(path):
+        """add the value of the state reached for the player that made each move"""
+        tree.backprop(path, player_values([state], game, evaluator, utility)[0])
+
+    iterations = 0
+    for _ in search_iterations(N, time_limit_ms):
+        # undo puts the drawn cards back, the order they are drawn in is sampled again
+        random.shuffle(state['deck'])
+        path, tokens = [], []
+        if stats is None:
+            select_expand(path, tokens)
+            simulate(tokens)
+            backprop(path)
+        else:
+            # the same iteration, timing each phase
+            start = time.perf_counter()
+            select_expand(path, tokens)
+            start = stats.add_time('select', start)
+            stats.reach(len(path))
+            simulate(tokens)
+            start = stats.add_time('simulate', start)
+            backprop(path)
+            stats.add_time('backprop', start)
+        for token in reversed(tokens):
+            game.undo(state, token)
+        iterations += 1
+
+    if info is not None:
+        info['iterations'] = iterations
+        info['tree'] = tree
+    children = tree.children(0)
+    if stats is not None:
+        stats.iterations += iterations
+        stats.root_scores = {tree.moves[tree.move[c]]: (int(tree.N[c]), float(tree.U[c])) for c in children}
+        stats.total_time += time.perf_counter() - search_start
+    if not children:
+        return None
+    return tree.moves[tree.move[max(children, key=lambda c: tree.N[c])]]
+
+
 # ______________________________________________________________________________
 # Players for Games
 
@@ -289,6 +734,15 @@ class Game:
         """Return the state that results from making a move from a state."""
         raise NotImplementedError
 
+    def apply(self, state, move):
+        """Make a move in place, return a token to pass to undo.
+        Optional, used by the in-place search functions."""
+        raise NotImplementedError
+
+    def undo(self, state, token):
+        """Take back the move that returned token from apply."""
+        raise NotImplementedError
+
     def utility(self, state, player):
         """Return the value of this final state to player."""
         raise NotImplementedError
@@ -0,0 +1,156 @@
+"""
+Single-Observer Information Set Monte Carlo Tree Search (SO-ISMCTS).
+
+The player to move does not know the opponent's hand or the order of the deck.
+Instead of searching one game where every unseen card could be in the opponent's
+hand, each iteration samples a determinization (a possible opponent hand and deck)
+and walks one shared tree with it. A node stands for the sequence of moves that
+leads to it, so it groups all the states that the observer cannot tell apart.
+Only the moves that are legal in the current determinization are considered,
+and the exploration term counts how often a node was available instead of how
+often its parent was visited (Cowling, Powley and Whitehouse, 2012).
+"""
+
+import math
+import random
+import time
+
+from search_stats import CountingGame
+from utilities import make_utility
+from determinization import DeterminizationSampler
+from tools import generate_move_smart, player_values, playout_inplace
+from utils4e import search_iterations
+
+
+class ISMCTS_Node:
+    """Node of the information set tree, reached by playing move from parent."""
+
+    def __init__(self, parent=None, move=None, player=None):
+        self.parent = parent
+        self.move = move
+        self.player = player  # the player who played move
+        self.U = 0  # the total utility of the playouts for player
+        self.N = 0  # the number of visits
+        self.avail = 0  # the number of times move was legal when the parent was visited
+        self.children = {}  # move -> node
+
+
+def ismcts_ucb(n, C=0.7):
+    return math.inf if n.N == 0 else n.U / n.N + C * math.sqrt(math.log(n.avail) / n.N)
+
+
+def depth(n):
+    """Return the number of moves from the root of the tree to node n."""
+    d = 0
+    while n.parent is not None:
+        n = n.parent
+        d += 1
+    return d
+
+
+def ismcts_subtree(root, moves):
+    """Return the node reached from root by playing moves, None if it is not in the tree."""
+    n = root
+    for move in moves:
+        n = n.children.get(move)
+        if n is None:
+            return None
+    return n
+
+
+def information_set_mcts(state, game, N=1000, time_limit_ms=None, info=None, C=0.7, root=None, rollout=None,
+                         cutoff=None, evaluator=None, utility=None, stats=None):
+    """Return the best move for the player to move in state, with SO-ISMCTS.
+    Runs N iterations, or as many as fit in time_limit_ms if it is given.
+    If info is a dictionary, the number of iterations is stored in info['iterations']
+    and the root of the tree in info['root']. The node of an earlier tree reached by
+    the moves played since then (see ismcts_subtree) can be passed as root to go on
+    with its statistics. rollout is the rollout policy, generate_move_smart if not given
+    (see playout_policies). With cutoff, the playouts stop after cutoff tricks and the
+    determinization reached is valued by evaluator (see tools.leaf_values). utility is the
+    utility of the playouts (a name or a Utility of utilities.py), the one of game if not given.
+    If stats is a search_stats.SearchStats, the determinizations are counted as copies and the
+    rest is counted as in games4e.monte_carlo_tree_search. The sampling of the determinization,
+    the selection and the expansion are timed together as 'select'."""
+    rollout = rollout or generate_move_smart
+    utility = make_utility(utility)
+    if stats is not None:
+        game = CountingGame(game, stats)
+        search_start = time.perf_counter()
+    if root is None:
+        root = ISMCTS_Node()
+    root.parent = root.move = root.player = None
+
+    sampler = DeterminizationSampler(state, seed=random.getrandbits(64))
+
+    def select_expand(d):
+        """walk down the tree making the moves on the determinization d, stop after adding
+        a child for an untried move, and return the node reached"""
+        node = root
+
+        # select, while every legal move has a child
+        while not game.terminal_test(d):
+            legal = game.actions(d)
+            untried = [move for move in legal if move not in node.children]
+            if untried:
+                break
+            for move in legal:
+                node.children[move].avail += 1
+            node = max((node.children[move] for move in legal), key=lambda n: ismcts_ucb(n, C))
+            game.apply(d, node.move)
+
+        # expand one untried move
+        if not game.terminal_test(d):
+            for move in legal:
+                if move in node.children:
+                    node.children[move].avail += 1
+            move = random.choice(untried)
+            child = ISMCTS_Node(parent=node, move=move, player=game.to_move(d))
+            child.avail = 1
+            node.children[move] = child
+            game.apply(d, move)
+            node = child
+            if stats is not None:
+                stats.nodes_expanded += 1
+        return node
+
+    def backprop(node, d):
+        """add the value of the state d reached for the player who made each move"""
+        values = player_values([d], game, evaluator, utility)[0]
+        while node is not None:
+            node.N += 1
+            if node.player is not None:
+                node.U += values[node.player]
+            node = node.parent
+
+    iterations = 0
+    for _ in search_iterations(N, time_limit_ms):
+        if stats is None:
+            # a possible state given what the player to move knows
+            d = sampler.sample()[0]
+            node = select_expand(d)
+            playout_inplace(d, game, rollout, cutoff)
+            backprop(node, d)
+        else:
+            # the same iteration, timing each phase
+            start = time.perf_counter()
+            d = sampler.sample()[0]
+            stats.copies += 1
+            node = select_expand(d)
+            start = stats.add_time('select', start)
+            stats.reach(depth(node))
+            playout_inplace(d, game, rollout, cutoff)
+            stats.rollouts += 1
+            start = stats.add_time('simulate', start)
+            backprop(node, d)
+            stats.add_time('backprop', start)
+        iterations += 1
+
+    if info is not None:
+        info['iterations'] = iterations
+        info['root'] = root
+    if stats is not None:
+        stats.iterations += iterations
+        stats.root_scores = {move: (n.N, n.U) for move, n in root.children.items()}
+        stats.total_time += time.perf_counter() - search_start
+    return max(root.children.values(), key=lambda n: n.N).move
@@ -0,0 +1,105 @@
+"""
+Array-backed Monte Carlo search tree, used by games4e.monte_carlo_tree_search_pool.
+
+The children of a node are picked by a tree policy of tree_policies, which scores
+them all at once from the arrays of the tree.
+"""
+
+import math
+
+import numpy as np
+
+
+class MCT_Tree:
+    """Monte Carlo search tree stored as a struct of arrays, one entry per node.
+    Node 0 is the root. The children of a node are added all at once, so they
+    take the consecutive entries first_child .. first_child + n_children - 1.
+    Nodes keep no state and moves are stored as integer ids (see move_id):
+    a node costs about 70 bytes instead of an MCT_Node with its state.
+    The children are picked by a tree policy, see tree_policies."""
+
+    ARRAYS = ('N', 'U', 'U2', 'P', 'Q', 'inv_sqrt_N', 'log_N', 'parent', 'move', 'player', 'first_child', 'n_children')
+
+    def __init__(self, capacity=1024):
+        self.size = 1
+        self.N = np.zeros(capacity, dtype=np.int64)  # visits
+        self.U = np.zeros(capacity, dtype=np.float64)  # total utility for the player who moved
+        self.U2 = np.zeros(capacity, dtype=np.float64)  # total squared utility, for UCB1-Tuned
+        self.P = np.zeros(capacity, dtype=np.float64)  # prior probability of the move, for PUCT
+        # kept up to date for the UCB: U / N, 1 / sqrt(N) (infinite before the first visit) and log(N)
+        self.Q = np.zeros(capacity, dtype=np.float64)
+        self.inv_sqrt_N = np.full(capacity, np.inf, dtype=np.float64)
+        self.log_N = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.move = np.full(capacity, -1, dtype=np.int32)  # id of the move from the parent
+        self.player = np.zeros(capacity, dtype=np.int8)  # the player who made the move
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+        self.moves = []  # move id -> move
+        self.ids = {}  # move -> move id
+
+    def move_id(self, move):
+        """Return the integer id of a move, giving it a new one the first time."""
+        i = self.ids.get(move)
+        if i is None:
+            i = self.ids[move] = len(self.moves)
+            self.moves.append(move)
+        return i
+
+    def grow(self, capacity):
+        """Make room for at least capacity nodes."""
+        new_capacity = len(self.N)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            fill = -1 if name in ('parent', 'move', 'first_child') else np.inf if name == 'inv_sqrt_N' else 0
+            new = np.full(new_capacity, fill, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add_children(self, node, moves, player, priors=None):
+        """Add a child of node for each move, made by player, and return the index of the first one.
+        priors are the prior probabilities of the moves, uniform if not given."""
+        first = self.size
+        if first + len(moves) > len(self.N):
+            self.grow(first + len(moves))
+        last = first + len(moves)
+        self.parent[first:last] = node
+        self.move[first:last] = [self.move_id(move) for move in moves]
+        self.player[first:last] = player
+        self.P[first:last] = (1 / len(moves)) if priors is None else priors
+        self.first_child[node] = first
+        self.n_children[node] = len(moves)
+        self.size = last
+        return first
+
+    def children(self, node):
+        """Return the range of the indices of the children of node."""
+        first = self.first_child[node]
+        return range(first, first + self.n_children[node])
+
+    def legal_mask(self, moves):
+        """Return a boolean array over the move ids, True for the ids of moves."""
+        mask = np.zeros(len(self.moves), dtype=bool)
+        mask[[self.ids[move] for move in moves if move in self.ids]] = True
+        return mask
+
+    def backprop(self, path, utilities):
+        """Add a visit to the root and to the nodes of path, with utilities[player] for the player of each node."""
+        self.N[0] += 1
+        self.log_N[0] = math.log(self.N[0])
+        path = np.asarray(path, dtype=np.int64)
+        N = self.N[path] + 1
+        self.N[path] = N
+        u = np.asarray(utilities, dtype=np.float64)[self.player[path]]
+        self.U[path] += u
+        self.U2[path] += u * u
+        # the terms of the UCB of the nodes of path, and of their children
+        self.Q[path] = self.U[path] / N
+        self.inv_sqrt_N[path] = 1 / np.sqrt(N)
+        self.log_N[path] = np.log(N)
+
+    def nbytes(self):
+        """Return the memory used by the arrays of the nodes."""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
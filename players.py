@@ -1,9 +1,43 @@
 import random
-from games4e import monte_carlo_tree_search, alpha_beta_search, alpha_beta_cutoff_search
-from tools import compare_cards, get_card_value, my_monte_carlo_tree_search, generate_move_smart
+from concurrent.futures import ProcessPoolExecutor
+from games4e import monte_carlo_tree_search, monte_carlo_tree_search_pool, alpha_beta_search_inplace, alpha_beta_cutoff_search_inplace, subtree
+from tools import compare_cards, get_card_value, my_monte_carlo_tree_search, generate_move_smart, leaf_values, DeterminizedEvaluator
+from endgame import EndgameSolver
+from ismcts import information_set_mcts, ismcts_subtree
+from tree_policies import make_policy
+from playout_policies import make_rollout
+from value_network import make_evaluator
+from utilities import make_utility
+from determinization import DeterminizationSampler, evidence_weights
+from search_stats import SearchStats
 from copy import deepcopy   
 full_deck = [(i, suit) for i in ['Ace', '2', '3', '4', '5', '6', '7', 'Jack', 'Horse', 'King'] for suit in ['Bastoni', 'Denari', 'Spade', 'Coppe']]
 
+def observed_moves(last_state, last_move, state):
+    """
+    Return the moves played since last_state, where the player to move played last_move,
+    up to state, where the same player is to move again: last_move, the answer of the
+    opponent if last_move led the trick, and the card the opponent led after taking it.
+    Return None if state does not follow from last_state.
+    """
+    if last_state is None or state['player'] != last_state['player']:
+        return None
+    last_played = set(last_state['taken1'] + last_state['taken2'] + last_state['table'])
+    played = set(state['taken1'] + state['taken2'] + state['table'])
+    if not last_played <= played or last_move not in played:
+        return None
+    moves = [last_move]
+    if not last_state['table']:
+        # last_move led the trick, the opponent answered with a card that is now taken
+        answer = played - last_played - {last_move} - set(state['table'])
+        if len(answer) != 1:
+            return None
+        moves.extend(answer)
+    moves.extend(card for card in state['table'] if card not in last_played)
+    if len(played - last_played) != len(moves):
+        return None
+    return moves
+
 class RandomPlayer:
     """A player that chooses a legal move at random."""
 
@@ -66,9 +100,27 @@ class SmartPlayer:
 class MonteCarloTreeSearchPlayer:
     """A player that chooses a legal move based on the Monte Carlo Tree Search algorithm."""
 
-    def __init__(self, simulations=1000):
+    def __init__(self, simulations=1000, time_limit_ms=None, reuse_tree=True, n_workers=1, parallel='root', profile=False,
+                 rollout='smart', cutoff=None, evaluator=None, leaf_batch=1, utility=None):
         """Initialize the player."""
+        self.utility = make_utility(utility)  # the utility the search maximizes, see utilities; the one of the game if None
+        self.cutoff = cutoff  # if given, the rollouts stop after this many tricks and are valued by the evaluator
+        self.evaluator = make_evaluator(evaluator)  # see value_network.make_evaluator, the heuristic if None
+        self.leaf_batch = leaf_batch  # the number of leaves evaluated together
+        self.rollout = make_rollout(rollout) if isinstance(rollout, str) else rollout  # the rollout policy, see playout_policies
         self.simulations = simulations  # the number of simulations
+        self.time_limit_ms = time_limit_ms  # if given, search for this long instead of a number of simulations
+        self.iterations = 0  # the number of simulations run for the last move
+        self.endgame_solver = EndgameSolver()  # solves the game once the deck is empty
+        self.reuse_tree = reuse_tree  # go on with the subtree of the moves played since the last search
+        self.tree = None  # the root of the last search
+        self.last_state = None  # the state of the last search
+        self.last_move = None  # the move chosen by the last search
+        self.n_workers = n_workers  # the number of processes or threads of the search
+        self.parallel = parallel  # 'root' or 'tree', see monte_carlo_tree_search
+        self.executor = None  # the process pool of root parallelization, created at the first move
+        self.profile = profile  # collect the statistics of each search
+        self.stats = None  # with profile, the SearchStats of the last move
 
     def generate_move(self, state, game):
         """Choose a move based on the Monte Carlo Tree Search algorithm."""
@@ -80,24 +132,85 @@ class MonteCarloTreeSearchPlayer:
 
         new_hand_2 = [card for card in full_deck if card not in state_copy["hand1"] and card not in state_copy["taken1"] and card not in state_copy["taken2"] and card not in state_copy["table"] and  card != state_copy["briscola"]]        
         state_copy["hand2"] = new_hand_2
+        # the order of the real deck is unknown, the cards are drawn from the end of a shuffled copy
+        random.shuffle(state_copy["deck"])
 
         # check that all cards are still present
-        total_cards = len(state_copy["hand1"]) + len(state_copy["hand2"]) + len(state_copy["table"]) + len(state_copy["taken1"]) + len(state_copy["taken2"]) + 1 # for briscola
+        total_cards = len(state_copy["hand1"]) + len(state_copy["hand2"]) + len(state_copy["table"]) + len(state_copy["taken1"]) + len(state_copy["taken2"])
+        # the briscola is not among the unseen cards, count it if it is not anywhere else
+        if state_copy["briscola"] not in state_copy["hand1"] + state_copy["taken1"] + state_copy["taken2"] + state_copy["table"]:
+            total_cards += 1
         if total_cards != 40:
             print("ERROR: total number of cards is not 40")
         
         if len(state['deck']) != 0:
-            return monte_carlo_tree_search(state_copy, game, self.simulations)
+            root = None
+            if self.reuse_tree and self.tree is not None:
+                moves = observed_moves(self.last_state, self.last_move, state)
+                if moves is not None:
+                    root = subtree(self.tree, moves)
+            info = {}
+            if self.n_workers > 1 and self.parallel == 'root' and self.executor is None:
+                self.executor = ProcessPoolExecutor(self.n_workers)
+            self.stats = SearchStats() if self.profile else None
+            # player 2 holds every unseen card, the states cut off are dealt properly before they are valued
+            evaluator = DeterminizedEvaluator(self.evaluator, self.utility or game.utility_function)
+            move = monte_carlo_tree_search(state_copy, game, self.simulations, self.time_limit_ms, info, root,
+                                           n_workers=self.n_workers, parallel=self.parallel, executor=self.executor,
+                                           stats=self.stats, rollout=self.rollout, cutoff=self.cutoff,
+                                           evaluator=evaluator, leaf_batch=self.leaf_batch, utility=self.utility)
+            self.iterations = info['iterations']
+            # with root parallelization the trees stay in the worker processes
+            if self.reuse_tree and info['root'] is not None:
+                self.tree, self.last_state, self.last_move = info['root'], deepcopy(state), move
+            return move
         else:
-            state_copy = deepcopy(state)
-            return alpha_beta_search(state_copy, game)
-        
+            self.iterations = 0
+            self.tree = None
+            return self.endgame_solver.best_move(state)
+
+    def close(self):
+        """Shut down the process pool of the search, if there is one; a new one is created if the player moves again."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 class MyMonteCarloTreeSearchPlayer:
     """A player that chooses a legal move based on the Monte Carlo Tree Search algorithm."""
 
-    def __init__(self, simulations=1000):
+    def __init__(self, simulations=1000, n_workers=1, time_limit_ms=None, vectorized=False, evidence_weight=None,
+                 common_random_numbers=False, z=None, allocation=None, budget=None, profile=False, rollout='smart',
+                 cutoff=None, evaluator=None, utility=None):
         """Initialize the player."""
+        self.utility = make_utility(utility)  # the utility the search maximizes, see utilities; the one of the game if None
+        self.cutoff = cutoff  # if given, the simulations stop after this many tricks and are valued by the evaluator
+        self.evaluator = make_evaluator(evaluator)  # see value_network.make_evaluator, the heuristic if None
+        # the rollout policy, see playout_policies; the vectorized simulations always play greedily
+        self.rollout = make_rollout(rollout) if isinstance(rollout, str) else rollout
         self.simulations = simulations  # the number of simulations
+        self.vectorized = vectorized  # play the simulations in NumPy batches
+        self.common_random_numbers = common_random_numbers  # simulate all the moves on the same deals
+        self.z = z  # if given, stop the simulations once the best move is this many standard errors ahead
+        self.allocation = allocation  # 'halving', 'ucb' or 'lucb' to spread a total budget over the moves
+        self.budget = budget  # the total number of simulations of a move with allocation
+        self.confidence = None  # with allocation, the confidence in the last move
+        self.profile = profile  # collect the statistics of each search
+        self.stats = None  # with profile, the SearchStats of the last move
+        # if given, the weight of the cards the opponent's last answer suggests they do not hold
+        self.evidence_weight = evidence_weight
+        self.last_state = None  # the state of the last search
+        self.last_move = None  # the move chosen by the last search
+        self.time_limit_ms = time_limit_ms  # if given, search for this long instead of a number of simulations
+        self.iterations = 0  # the number of simulations run for the last move
+        self.n_workers = n_workers  # the number of processes running the simulations
+        self.executor = None  # the process pool, created at the first move
+        self.endgame_solver = EndgameSolver()  # solves the game once the deck is empty
 
     def generate_move(self, state, game):
         """Choose a move based on the Monte Carlo Tree Search algorithm."""
@@ -108,39 +221,183 @@ class MyMonteCarloTreeSearchPlayer:
         # we convert it here by assuming that player 2's hand is 
         # the deck - hand1, taken1, taken2, table, (and briscola later)
 
-        new_hand_2 = [card for card in full_deck if card not in state_copy["hand1"] and card not in state_copy["taken1"] and card not in state_copy["taken2"] and card not in state_copy["table"] and  card != state_copy["briscola"]]        
-        state_copy["hand2"] = new_hand_2
+        sampler = DeterminizationSampler(state, weights=self.evidence(state))
+        state_copy["hand2"] = sampler.unseen_cards()
 
         # check that all cards are still present
-        total_cards = len(state_copy["hand1"]) + len(state_copy["hand2"]) + len(state_copy["table"]) + len(state_copy["taken1"]) + len(state_copy["taken2"]) + 1 # for briscola
+        total_cards = len(state_copy["hand1"]) + len(state_copy["hand2"]) + len(state_copy["table"]) + len(state_copy["taken1"]) + len(state_copy["taken2"])
+        # the briscola is not among the unseen cards, count it if it is not anywhere else
+        if state_copy["briscola"] not in state_copy["hand1"] + state_copy["taken1"] + state_copy["taken2"] + state_copy["table"]:
+            total_cards += 1
         if total_cards != 40:
             print("ERROR: total number of cards is not 40")
         
         if len(state['deck']) != 0:
-            return my_monte_carlo_tree_search(state_copy, game, self.simulations)
+            if self.n_workers > 1 and self.executor is None:
+                self.executor = ProcessPoolExecutor(self.n_workers)
+            info = {}
+            self.stats = SearchStats() if self.profile else None
+            move = my_monte_carlo_tree_search(state_copy, game, self.simulations, n_workers=self.n_workers,
+                                              executor=self.executor, time_limit_ms=self.time_limit_ms, info=info,
+                                              vectorized=self.vectorized, sampler=sampler,
+                                              common_random_numbers=self.common_random_numbers, z=self.z,
+                                              allocation=self.allocation, budget=self.budget, stats=self.stats,
+                                              rollout=self.rollout, cutoff=self.cutoff, evaluator=self.evaluator,
+                                              utility=self.utility)
+            self.iterations = info['iterations']
+            self.confidence = info.get('confidence')
+            self.last_state, self.last_move = deepcopy(state), move
+            return move
         else:
-            state_copy = deepcopy(state)
-            return alpha_beta_search(state_copy, game)
-    
+            self.iterations = 0
+            return self.endgame_solver.best_move(state)
+
+    def close(self):
+        """Shut down the process pool of the search, if there is one; a new one is created if the player moves again."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def evidence(self, state):
+        """Return the weights of the unseen cards given how the opponent answered the last move, see evidence_weights."""
+        if self.evidence_weight is None:
+            return None
+        moves = observed_moves(self.last_state, self.last_move, state)
+        if moves is None or len(moves) < 2 or self.last_state['table']:
+            return None
+        # moves[1] is the answer of the opponent to the card led by this player
+        unseen = [card for card in full_deck if card not in state['hand1'] + state['table'] + state['taken1'] + state['taken2']]
+        return evidence_weights(moves[0], moves[1], state['briscola'], unseen, self.evidence_weight)
+
 class AlphaBetaPlayer:
 
-    def __init__(self):
-        pass
+    def __init__(self, profile=False, utility=None):
+        self.utility = make_utility(utility)  # the utility of the final states, see utilities; the one of the game if None
+        self.profile = profile  # collect the statistics of each search
+        self.stats = None  # with profile, the SearchStats of the last move
     
-    def generate_move(self, state_copy, game):
+    def generate_move(self, state, game):
         """Choose a move based on alpha beta search with pruning"""
-        return alpha_beta_search(state_copy, game)
+        state_copy = deepcopy(state)
+        # the order of the real deck is unknown, the cards are drawn from the end of a shuffled copy
+        # and the search sees this one order of the draws
+        random.shuffle(state_copy["deck"])
+        self.stats = SearchStats() if self.profile else None
+        return alpha_beta_search_inplace(state_copy, game, self.stats, self.utility)
 
 class AlphaBetaPruningPlayer:
 
-    def __init__(self):
-        # self.evaluation_function = eval_function
-        # self.d = d
-        pass
+    def __init__(self, d=12, evaluator='heuristic', profile=False, utility=None):
+        self.d = d  # the depth of the search, in moves
+        self.utility = make_utility(utility)  # the utility of the final states, see utilities; the one of the game if None
+        # values the states at depth d, see value_network.make_evaluator
+        self.evaluator = make_evaluator(evaluator)
+        self.profile = profile  # collect the statistics of each search
+        self.stats = None  # with profile, the SearchStats of the last move
     
-    def generate_move(self, state_single, game):
+    def generate_move(self, state, game):
         """Choose a move based on alpha beta search with pruning"""
         # take a single player state and randomly assign a hand to the other player
+        state_single = deepcopy(state)
+        # the order of the real deck is unknown, the cards are drawn from the end of a shuffled copy
+        # and the search sees this one order of the draws
+        random.shuffle(state_single["deck"])
+        self.stats = SearchStats() if self.profile else None
+        player = game.to_move(state_single)
+        return alpha_beta_cutoff_search_inplace(state_single, game, self.d,
+                                                eval_fn=lambda state: leaf_values([state], game, [player], self.evaluator, self.utility)[0],
+                                                stats=self.stats, utility=self.utility)
 
-        return alpha_beta_cutoff_search(state_single, game)
 
+class InformationSetMCTSPlayer:
+    """A player that chooses a legal move with Information Set Monte Carlo Tree Search,
+    sampling the opponent's hand and the deck again at every iteration."""
+
+    def __init__(self, simulations=1000, time_limit_ms=None, reuse_tree=True, rollout='smart', cutoff=None, evaluator=None,
+                 utility=None, profile=False):
+        """Initialize the player."""
+        self.utility = make_utility(utility)  # the utility the search maximizes, see utilities; the one of the game if None
+        self.cutoff = cutoff  # if given, the playouts stop after this many tricks and are valued by the evaluator
+        self.evaluator = make_evaluator(evaluator)  # see value_network.make_evaluator
+        self.rollout = make_rollout(rollout) if isinstance(rollout, str) else rollout  # the rollout policy, see playout_policies
+        self.simulations = simulations  # the number of simulations
+        self.time_limit_ms = time_limit_ms  # if given, search for this long instead of a number of simulations
+        self.iterations = 0  # the number of simulations run for the last move
+        self.endgame_solver = EndgameSolver()  # solves the game once the deck is empty
+        self.reuse_tree = reuse_tree  # go on with the subtree of the moves played since the last search
+        self.tree = None  # the root of the last search
+        self.last_state = None  # the state of the last search
+        self.last_move = None  # the move chosen by the last search
+        self.profile = profile  # collect the statistics of each search
+        self.stats = None  # with profile, the SearchStats of the last move
+
+    def generate_move(self, state, game):
+        """Choose a move based on the Information Set Monte Carlo Tree Search algorithm."""
+        if len(state['deck']) != 0:
+            root = None
+            if self.reuse_tree and self.tree is not None:
+                moves = observed_moves(self.last_state, self.last_move, state)
+                if moves is not None:
+                    root = ismcts_subtree(self.tree, moves)
+            info = {}
+            self.stats = SearchStats() if self.profile else None
+            move = information_set_mcts(state, game, self.simulations, self.time_limit_ms, info, root=root, rollout=self.rollout,
+                                        cutoff=self.cutoff, evaluator=self.evaluator, utility=self.utility,
+                                        stats=self.stats)
+            self.iterations = info['iterations']
+            if self.reuse_tree:
+                self.tree, self.last_state, self.last_move = info['root'], deepcopy(state), move
+            return move
+        else:
+            self.iterations = 0
+            self.tree = None
+            return self.endgame_solver.best_move(state)
+
+
+class PolicyMCTSPlayer:
+    """A player that chooses a legal move with the array tree search of monte_carlo_tree_search_pool,
+    and the tree policy of tree_policies with the class name policy, built with policy_args.
+    rollout is the rollout policy: a name of playout_policies.make_rollout or a policy. With cutoff,
+    the playouts stop after cutoff tricks and are valued by evaluator (see value_network.make_evaluator).
+    utility is the utility the search maximizes, a name of utilities.UTILITIES or a Utility.
+    With profile, the SearchStats of the last move are kept in stats."""
+
+    def __init__(self, simulations=1000, time_limit_ms=None, policy='UCB1', rollout='smart', cutoff=None, evaluator=None,
+                 utility=None, profile=False, **policy_args):
+        """Initialize the player."""
+        self.cutoff = cutoff
+        self.evaluator = make_evaluator(evaluator)
+        self.utility = make_utility(utility)
+        self.rollout = make_rollout(rollout) if isinstance(rollout, str) else rollout
+        self.simulations = simulations  # the number of simulations
+        self.time_limit_ms = time_limit_ms  # if given, search for this long instead of a number of simulations
+        self.policy = make_policy(policy, **policy_args)
+        self.iterations = 0  # the number of simulations run for the last move
+        self.endgame_solver = EndgameSolver()  # solves the game once the deck is empty
+        self.profile = profile  # collect the statistics of each search
+        self.stats = None  # with profile, the SearchStats of the last move
+
+    def generate_move(self, state, game):
+        """Choose a move based on the Monte Carlo Tree Search algorithm."""
+        if len(state['deck']) == 0:
+            self.iterations = 0
+            return self.endgame_solver.best_move(state)
+        # player 2 may hold any card that player 1 has not seen, as in MonteCarloTreeSearchPlayer
+        state_copy = deepcopy(state)
+        seen = state["hand1"] + state["taken1"] + state["taken2"] + state["table"] + [state["briscola"]]
+        state_copy["hand2"] = [card for card in full_deck if card not in seen]
+        # the order of the real deck is unknown, the cards are drawn from the end of a shuffled copy
+        random.shuffle(state_copy["deck"])
+        info = {}
+        self.stats = SearchStats() if self.profile else None
+        evaluator = DeterminizedEvaluator(self.evaluator, self.utility or game.utility_function)
+        move = monte_carlo_tree_search_pool(state_copy, game, self.simulations, self.time_limit_ms, info, self.policy, self.rollout,
+                                            self.cutoff, evaluator, self.utility, self.stats)
+        self.iterations = info['iterations']
+        return move
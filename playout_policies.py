@@ -0,0 +1,109 @@
+"""
+Rollout policies with precomputed move tables.
+
+A rollout policy is called as policy(state, game) and returns the move of the player
+to move, like tools.generate_move_smart. The policies here look the score of each card
+up in tables over card indices built once at import, so a move costs one lookup per
+card in hand instead of calls to get_card_value and compare_cards:
+
+    LEAD_COST[trump][card]            how much it costs to lead card, the lowest is led
+    ANSWER_SCORE[trump][lead][card]   how good card is as the answer to lead, the highest is played
+
+Two sets of tables are built. 'greedy' gives the same moves as generate_move_smart.
+'heavy' plays better Briscola:
+    - it does not spend a briscola to take a trick without points,
+    - it does not lead a briscola or a card with points if it has another card.
+
+With epsilon, a random legal move is played with probability epsilon. With temperature,
+a move is drawn with probability proportional to exp(score / temperature) instead of
+playing the best one. Both make the rollouts more varied at a small cost in quality.
+"""
+
+import math
+import random
+
+from card_tables import VALUE, WINNER
+from cards import CARD_INDEX, POINTS, STRENGTH, SUIT_INDEX, SUIT_OF
+from tools import generate_move_smart
+
+# greedy: the tables of generate_move_smart
+GREEDY_LEAD_COST = [[VALUE[card] for card in range(40)] for trump in range(4)]
+GREEDY_ANSWER_SCORE = [[[-(VALUE[lead] + VALUE[card]) if WINNER[trump][lead][card] else VALUE[lead] + VALUE[card]
+                         for card in range(40)] for lead in range(40)] for trump in range(4)]
+
+
+def heavy_lead_cost(card, trump):
+    """The cost of leading card: its points, more for a briscola, and a little for its strength."""
+    cost = POINTS[card] + 0.01 * STRENGTH[card]
+    if SUIT_OF[card] == trump:
+        cost += 12
+    return cost
+
+
+def heavy_answer_score(lead, card, trump):
+    """The score of answering lead with card: the points taken or given away, less the cost of
+    the briscola spent, and a little for keeping the stronger cards."""
+    points = POINTS[lead] + POINTS[card]
+    spent = 0.01 * STRENGTH[card]
+    if WINNER[trump][lead][card]:
+        # the trick is lost, give away as little as possible
+        return -points - spent
+    if SUIT_OF[card] == trump and SUIT_OF[lead] != trump:
+        # a briscola is only worth spending on a trick with points
+        spent += 5 + 0.1 * STRENGTH[card]
+    return points - spent
+
+
+HEAVY_LEAD_COST = [[heavy_lead_cost(card, trump) for card in range(40)] for trump in range(4)]
+HEAVY_ANSWER_SCORE = [[[heavy_answer_score(lead, card, trump) for card in range(40)] for lead in range(40)]
+                      for trump in range(4)]
+
+TABLES = {'greedy': (GREEDY_LEAD_COST, GREEDY_ANSWER_SCORE),
+          'heavy': (HEAVY_LEAD_COST, HEAVY_ANSWER_SCORE)}
+
+
+class PlayoutPolicy:
+    """
+    Rollout policy that plays the best move of the tables named tables ('greedy' or 'heavy'),
+    a random move with probability epsilon, or if temperature is given a move drawn from the
+    softmax of the scores. The draws use the global random generator, so that seeded games
+    are reproducible, and the policy can be sent to the worker processes.
+    """
+
+    def __init__(self, tables='heavy', epsilon=0.0, temperature=None):
+        self.tables = tables
+        self.epsilon = epsilon
+        self.temperature = temperature
+        self.lead_cost, self.answer_score = TABLES[tables]
+
+    def scores(self, state):
+        """Return the cards in the hand of the player to move and their scores, the higher the better."""
+        hand = state['hand' + str(state['player'])]
+        trump = SUIT_INDEX[state['briscola'][1]]
+        if state['table']:
+            row = self.answer_score[trump][CARD_INDEX[state['table'][0]]]
+            return hand, [row[CARD_INDEX[card]] for card in hand]
+        row = self.lead_cost[trump]
+        return hand, [-row[CARD_INDEX[card]] for card in hand]
+
+    def __call__(self, state, game=None):
+        hand, scores = self.scores(state)
+        if self.epsilon and random.random() < self.epsilon:
+            return random.choice(hand)
+        if self.temperature:
+            best = max(scores)
+            weights = [math.exp((score - best) / self.temperature) for score in scores]
+            return random.choices(hand, weights)[0]
+        # the first of the best cards, as generate_move_smart
+        return hand[scores.index(max(scores))]
+
+    def __repr__(self):
+        return 'PlayoutPolicy({!r}, epsilon={}, temperature={})'.format(self.tables, self.epsilon, self.temperature)
+
+
+def make_rollout(name='smart', **kwargs):
+    """Return the rollout policy called name: 'smart' for tools.generate_move_smart, or the
+    tables of a PlayoutPolicy ('greedy' or 'heavy') built with kwargs."""
+    if name == 'smart':
+        return generate_move_smart
+    return PlayoutPolicy(name, **kwargs)
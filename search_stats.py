@@ -0,0 +1,112 @@
+"""
+Opt-in instrumentation of the searches.
+
+The search functions take stats=None. When a SearchStats is given instead, they
+count what they do and time their phases into it, so a player can keep the
+statistics of each decision. When stats is None nothing is counted: the only
+cost is an `if stats is not None` test per phase.
+
+    stats = SearchStats()
+    move = monte_carlo_tree_search(state, game, 1000, stats=stats)
+    print(stats)
+"""
+
+import time
+
+
+class SearchStats:
+    """Counters and phase times of one search."""
+
+    PHASES = ('select', 'expand', 'simulate', 'backprop')
+
+    def __init__(self):
+        self.iterations = 0  # the iterations of the search
+        self.nodes_expanded = 0  # the nodes whose children were added, or searched by alpha-beta
+        self.rollouts = 0  # the games played to the end by the rollout policy
+        self.result_calls = 0  # the calls to game.result
+        self.apply_calls = 0  # the calls to game.apply
+        self.copies = 0  # the copies of a state: by result, and the determinizations
+        self.max_depth = 0  # the deepest node reached, the root is at depth 0
+        self.time = dict.fromkeys(self.PHASES, 0.0)  # seconds spent in each phase
+        self.total_time = 0.0  # seconds spent in the whole search
+        self.root_scores = {}  # statistics of each move at the root, as (visits or plays, utility or wins)
+
+    def add_time(self, phase, start):
+        """Add the time since start (a time.perf_counter() value) to phase, and return the current time."""
+        now = time.perf_counter()
+        self.time[phase] += now - start
+        return now
+
+    def reach(self, depth):
+        """Record that the search reached depth."""
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def merge(self, other):
+        """Add the counters and times of other, the statistics of another part of the same search."""
+        for name in ('iterations', 'nodes_expanded', 'rollouts', 'result_calls', 'apply_calls', 'copies'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for phase in self.PHASES:
+            self.time[phase] += other.time[phase]
+        for move, (n, u) in other.root_scores.items():
+            n0, u0 = self.root_scores.get(move, (0, 0))
+            self.root_scores[move] = (n0 + n, u0 + u)
+        return self
+
+    def as_dict(self):
+        """Return the statistics as a dictionary of plain values."""
+        return {'iterations': self.iterations,
+                'nodes_expanded': self.nodes_expanded,
+                'rollouts': self.rollouts,
+                'result_calls': self.result_calls,
+                'apply_calls': self.apply_calls,
+                'copies': self.copies,
+                'max_depth': self.max_depth,
+                'time': dict(self.time),
+                'total_time': self.total_time,
+                'root_scores': {str(move): score for move, score in self.root_scores.items()}}
+
+    def __str__(self):
+        lines = ["iterations {}, nodes expanded {}, rollouts {}, result calls {}, apply calls {}, copies {}, max depth {}".format(
+                     self.iterations, self.nodes_expanded, self.rollouts, self.result_calls, self.apply_calls,
+                     self.copies, self.max_depth),
+                 "time {:.4f}s: ".format(self.total_time) +
+                 ", ".join("{} {:.4f}s".format(phase, t) for phase, t in self.time.items() if t)]
+        lines.extend("  {}: {}".format(move, score) for move, score in self.root_scores.items())
+        return "\n".join(lines)
+
+
+class CountingGame:
+    """A game that counts the calls to result and apply of game into stats, and is otherwise the same.
+    Only used when stats are collected, so that the searches do not pay for the counting otherwise.
+    If several threads use the game, lock is a threading.Lock taken around the counting."""
+
+    def __init__(self, game, stats, lock=None):
+        self.game = game
+        self.stats = stats
+        self.lock = lock
+
+    def result(self, state, move):
+        if self.lock is None:
+            self.stats.result_calls += 1
+            self.stats.copies += 1
+        else:
+            with self.lock:
+                self.stats.result_calls += 1
+                self.stats.copies += 1
+        return self.game.result(state, move)
+
+    def apply(self, state, move):
+        if self.lock is None:
+            self.stats.apply_calls += 1
+        else:
+            with self.lock:
+                self.stats.apply_calls += 1
+        return self.game.apply(state, move)
+
+    def __getattr__(self, name):
+        # only called for the attributes that CountingGame does not have
+        if name in ('game', 'stats', 'lock'):
+            raise AttributeError(name)
+        return getattr(self.game, name)
@@ -0,0 +1,38 @@
+import random
+
+from batch_rollout import batch_rollout
+from briscola_game import Briscola
+from cards import CARD_INDEX, POINTS
+from determinization import DeterminizationSampler
+from tools import generate_move_smart, playout
+
+
+def points(cards):
+    return sum(POINTS[CARD_INDEX[card]] for card in cards)
+
+
+def positions(n, seed=0):
+    """Yield n states reached by random moves, at every stage of the game, some with a card on the table."""
+    game = Briscola()
+    rng = random.Random(seed)
+    for state in Briscola.new_games(n, seed):
+        for _ in range(rng.randrange(39)):
+            state = game.result(state, rng.choice(game.actions(state)))
+        yield state
+
+
+def test_batch_matches_dictionary_playouts():
+    game = Briscola()
+    for i, state in enumerate(positions(30)):
+        player = state['player']
+        moves = game.actions(state)
+        # the same seed gives the same determinizations to the batch and to the dictionary states
+        for move in [None] + moves:
+            batch = batch_rollout(state, 8, move, sampler=DeterminizationSampler(state, seed=i))
+            expected = []
+            for d in DeterminizationSampler(state, seed=i).sample(8):
+                if move is not None:
+                    d = game.result(d, move)
+                end = playout(d, game, generate_move_smart)
+                expected.append(points(end['taken' + str(player)]))
+            assert batch.tolist() == expected
@@ -0,0 +1,59 @@
+import random
+
+from briscola_game import Briscola
+from tools import copy_state
+
+
+def random_games(n_games, seed=0):
+    """Yield the deal and the moves of n_games games played at random."""
+    game = Briscola()
+    rng = random.Random(seed)
+    for state in Briscola.new_games(n_games, seed):
+        initial, moves = state, []
+        while not game.terminal_test(state):
+            move = rng.choice(game.actions(state))
+            moves.append(move)
+            state = game.result(state, move)
+        yield initial, moves
+
+
+def test_apply_matches_result():
+    game = Briscola()
+    for initial, moves in random_games(50):
+        state, applied = initial, copy_state(initial)
+        for move in moves:
+            state = game.result(state, move)
+            game.apply(applied, move)
+            assert applied == state
+
+
+def test_undo_takes_back_a_whole_game():
+    game = Briscola()
+    for initial, moves in random_games(50, seed=1):
+        state = copy_state(initial)
+        states, tokens = [], []
+        for move in moves:
+            states.append(copy_state(state))
+            tokens.append(game.apply(state, move))
+        assert game.terminal_test(state)
+        for token, before in zip(reversed(tokens), reversed(states)):
+            game.undo(state, token)
+            assert state == before
+        assert state == initial
+
+
+def test_draws_come_from_the_end_of_the_deck():
+    game = Briscola()
+    for initial, moves in random_games(20, seed=3):
+        # player 1 draws the last card of the deck, player 2 the one before, and the briscola is drawn last
+        expected = list(reversed(initial['deck'])) + [initial['briscola']]
+        state, drawn = initial, []
+        for move in moves:
+            before = copy_state(state)
+            new_state = game.result(state, move)
+            # result draws on its own copy of the state
+            assert state == before
+            if not new_state['table'] and state['deck']:
+                drawn.extend([new_state['hand1'][-1], new_state['hand2'][-1]])
+            state = new_state
+        assert drawn == expected
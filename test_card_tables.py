@@ -0,0 +1,36 @@
+from cards import CARDS, POINTS, SUITS
+from card_tables import VALUE, WINNER
+
+# the ranks of a suit from the weakest to the strongest
+STRENGTH_ORDER = ['2', '4', '5', '6', '7', 'Jack', 'Horse', 'King', '3', 'Ace']
+RANK_POINTS = {'Ace': 11, '3': 10, 'King': 4, 'Horse': 3, 'Jack': 2}
+
+
+def first_wins(first, second, trump):
+    """The rule of a trick, on the (rank, suit) cards."""
+    if first[1] == second[1]:
+        return STRENGTH_ORDER.index(first[0]) > STRENGTH_ORDER.index(second[0])
+    return second[1] != trump
+
+
+def test_winner_matches_the_rules():
+    for trump_suit, trump in enumerate(SUITS):
+        for first, first_card in enumerate(CARDS):
+            for second, second_card in enumerate(CARDS):
+                if first != second:
+                    assert WINNER[trump_suit][first][second] == first_wins(first_card, second_card, trump)
+
+
+def test_points_of_the_cards():
+    for card, (rank, suit) in enumerate(CARDS):
+        assert POINTS[card] == RANK_POINTS.get(rank, 0)
+    assert sum(POINTS) == 120
+
+
+def test_value_orders_the_cards_of_a_suit():
+    for card, (rank, suit) in enumerate(CARDS):
+        assert int(VALUE[card]) == POINTS[card]
+        for other, (other_rank, other_suit) in enumerate(CARDS):
+            if other_suit == suit and other != card:
+                stronger = STRENGTH_ORDER.index(rank) > STRENGTH_ORDER.index(other_rank)
+                assert (VALUE[card] > VALUE[other]) == stronger
@@ -0,0 +1,38 @@
+import random
+
+from briscola_game import Briscola
+from cards import CARD_INDEX, POINTS
+from endgame import EndgameSolver
+
+
+def points(cards):
+    return sum(POINTS[CARD_INDEX[card]] for card in cards)
+
+
+def minimax(state, game, player):
+    """Return the final point differential of player from state, with both players playing perfectly."""
+    if game.terminal_test(state):
+        return points(state['taken' + str(player)]) - points(state['taken' + str(3 - player)])
+    values = [minimax(game.result(state, move), game, player) for move in game.actions(state)]
+    return max(values) if game.to_move(state) == player else min(values)
+
+
+def endgames(n, seed=0):
+    """Yield n states with an empty deck, reached by random moves, some with a card on the table."""
+    game = Briscola()
+    rng = random.Random(seed)
+    for state in Briscola.new_games(n, seed):
+        while state['deck'] or len(state['taken1']) + len(state['taken2']) < 34:
+            state = game.result(state, rng.choice(game.actions(state)))
+        for _ in range(rng.randrange(2)):
+            state = game.result(state, rng.choice(game.actions(state)))
+        yield state
+
+
+def test_move_values_match_minimax():
+    game = Briscola()
+    solver = EndgameSolver()
+    for state in endgames(40):
+        player = game.to_move(state)
+        expected = {move: minimax(game.result(state, move), game, player) for move in game.actions(state)}
+        assert solver.move_values(state) == expected
@@ -0,0 +1,39 @@
+from briscola_game import Briscola
+from cards import CARD_INDEX
+from fast_briscola import BriscolaState, FastBriscola
+from test_briscola_game import random_games
+
+
+def same_state(fast, state):
+    """True if the compact state holds the same cards in the same places as the dictionary state."""
+    back = fast.to_dict()
+    return (all(sorted(back[key]) == sorted(state[key]) for key in ('hand1', 'hand2', 'taken1', 'taken2'))
+            and all(back[key] == state[key] for key in ('table', 'player', 'briscola', 'deck')))
+
+
+def test_dictionary_round_trip():
+    game = Briscola()
+    for initial, moves in random_games(20):
+        state = initial
+        for move in moves:
+            fast = BriscolaState.from_dict(state)
+            assert same_state(fast, state)
+            assert BriscolaState.from_dict(fast.to_dict()) == fast
+            state = game.result(state, move)
+
+
+def test_fast_game_matches_briscola():
+    game = Briscola()
+    for initial, moves in random_games(50, seed=2):
+        fast_game = FastBriscola(initial)
+        state, fast = initial, fast_game.initial
+        for move in moves:
+            assert sorted(fast_game.actions(fast)) == sorted(CARD_INDEX[card] for card in game.actions(state))
+            assert fast_game.to_move(fast) == game.to_move(state)
+            assert not fast_game.terminal_test(fast)
+            state = game.result(state, move)
+            fast = fast_game.result(fast, CARD_INDEX[move])
+            assert same_state(fast, state)
+        assert fast_game.terminal_test(fast)
+        for player in (1, 2):
+            assert fast_game.utility(fast, player) == game.utility(state, player)
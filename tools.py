@@ -1,144 +1,586 @@
+import math
 import random
-from copy import deepcopy 
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cards import CARD_INDEX, POINTS, STRENGTH, SUIT_INDEX
+from card_tables import RANK_VALUE, WINNER
+from batch_rollout import batch_wins, batch_wins_paired
+from determinization import DeterminizationSampler
+from search_stats import CountingGame
+from utilities import Utility, make_utility
 
 def get_card_value(card):
     '''
     card: a list of two elements, the first one is the value, the second one is the suite
     '''
-    card_value = card[0]
-
-    if card_value == 'Ace': 
-        return 11
-    elif card_value == '3': 
-        return 10
-    elif card_value == 'King': 
-        return 4
-    elif card_value == 'Horse': 
-        return 3
-    elif card_value == 'Jack': 
-        return 2
-    elif card_value == '7': 
-        return 0.0007
-    elif card_value == '6': 
-        return 0.0006
-    elif card_value == '5': 
-        return 0.0005
-    elif card_value == '4': 
-        return 0.0004
-    elif card_value == '2': 
-        return 0.0002
+    return RANK_VALUE[card[0]]
 
 def compare_cards(card_first_to_move, card_second_to_move, trump):
     """
     Returns True if the first card wins, False otherwise
     """
-    # Get the suites and values of the cards
-    trump_suite = trump[1]
-    card_first_to_move_suite = card_first_to_move[1]
-    card_second_to_move_suite = card_second_to_move[1]
-    card_first_to_move_value = get_card_value(card_first_to_move)
-    card_second_to_move_value = get_card_value(card_second_to_move)
-
-    # If one card is the trump and the other is not, the trump wins
-    if card_first_to_move_suite == trump_suite and card_second_to_move_suite != trump_suite:
-        return True
-    elif card_first_to_move_suite != trump_suite and card_second_to_move_suite == trump_suite:
-        return False
-    
-    # If the suites are the same, the highest value wins
-    elif card_first_to_move_suite == card_second_to_move_suite:
-        if card_first_to_move_value > card_second_to_move_value:
-            return True
-        elif card_first_to_move_value < card_second_to_move_value:
-            return False
-        
-    # If the suites are different and none of them is the trump, the first one to move wins
-    else:
-        return True
+    return WINNER[SUIT_INDEX[trump[1]]][CARD_INDEX[card_first_to_move]][CARD_INDEX[card_second_to_move]]
     
+def copy_state(state):
+    """
+    Returns a copy of a state with new lists and the same cards, much cheaper than deepcopy
+    since the cards are tuples
+    """
+    return {key: (list(value) if isinstance(value, list) else value) for key, value in state.items()}
+
+def shuffle_deck(state, seed=None):
+    """
+    Shuffles the deck of state in place, with random.Random(seed) if seed is given so that
+    the order of the draws can be replayed, and returns state
+    """
+    (random.Random(seed) if seed is not None else random).shuffle(state['deck'])
+    return state
+
 def draw_cards(state):
     """
-    Removes two random cards from the deck and puts is in the hands
+    Each player draws a card in place, player 1 first, and returns the state.
+    The deck is a stack that is already shuffled, so a draw is a pop from its end.
+    When the deck is over the second card is the briscola
     """
-    state_copy = deepcopy(state)
-    card1 = random.choice(state_copy['deck'])
-    state_copy['deck'].remove(card1)
+    deck = state['deck']
+    card1 = deck.pop()
+    card2 = deck.pop() if deck else state['briscola']
+    state['hand1'].append(card1)
+    state['hand2'].append(card2)
+    return state
 
-    try:
-        card2 = random.choice(state_copy['deck'])
-        state_copy['deck'].remove(card2)
-    except IndexError:
-        card2 = state_copy['briscola']
-        # print('Deck is empty, trump is drawn')
+def determinize(state, player=None):
+    """
+    Returns a copy of state where the cards unseen by player (the player to move if not given)
+    are dealt at random to the opponent's hand and to the deck. Only the hand of player, the table,
+    the taken cards and the briscola are looked at, so the opponent's real hand is not used.
+    The cards are dealt by a DeterminizationSampler seeded from the random module.
+    """
+    return DeterminizationSampler(state, seed=random.getrandbits(64), player=player).sample()[0]
 
-    state_copy['hand1'].append(card1)
-    state_copy['hand2'].append(card2)
+# the default utility of the heuristic, as the one of Briscola
+WIN = Utility('win')
 
-    return state_copy
+def hand_strength(hand, trump):
+    """
+    Returns the advantage that hand gives on the points still to be played: a quarter of its
+    points, 4 for each briscola and 1 for each ace or three
+    """
+    strength = 0.0
+    for card in hand:
+        i = CARD_INDEX[card]
+        strength += 0.25 * POINTS[i] + (4 if card[1] == trump else 0) + (1 if STRENGTH[i] >= 8 else 0)
+    return strength
 
 def evaluation_function(state, player_number):
     """
-    Evaluates the state given a player. It is the difference in points earned
+    Evaluates the state given a player: an estimate of their final point difference, the points
+    already taken by each player and the strength of their hands (see hand_strength). The weights
+    are round numbers set by hand, they were not fitted
+    """
+    me, other = str(player_number), str(3 - player_number)
+    trump = state['briscola'][1]
+    taken = sum(POINTS[CARD_INDEX[card]] for card in state['taken' + me]) - sum(POINTS[CARD_INDEX[card]] for card in state['taken' + other])
+    return taken + hand_strength(state['hand' + me], trump) - hand_strength(state['hand' + other], trump)
+
+def heuristic_value(state, player_number, utility=None):
+    """
+    Returns the expected utility (a utilities.Utility, 'win' if not given) of player_number from
+    state. The probability of a win is a logistic function of evaluation_function, flatter when
+    more points are still to be played, and the expected margin is evaluation_function
+    """
+    margin = evaluation_function(state, player_number)
+    # never below 0, even on the states of the searches where a card can be taken twice
+    remaining = max(120 - sum(POINTS[CARD_INDEX[card]] for card in state['taken1'] + state['taken2']), 0)
+    # the player wins with 61 points, a margin of 2 or more; the scale is a hand-set guess of how
+    # much the margin can still change
+    scale = 2 * (0.7 * math.sqrt(remaining) + 0.5)
+    win_probability = 1 / (1 + math.exp(-(margin - 1) / scale))
+    return (utility or WIN).expected(win_probability, margin)
+
+def heuristic_evaluator(states, players, utility=None):
+    """
+    The evaluator of heuristic_value, with the interface of value_network.ValueNetwork
+    """
+    return [heuristic_value(state, player, utility) for state, player in zip(states, players)]
+
+def playout(state, game, rollout=None, cutoff=None):
+    """
+    Plays the game from state with the rollout policy (generate_move_smart if not given, see
+    playout_policies) and returns the state reached: the final state, or with cutoff the state
+    after cutoff more tricks are over, if the game does not end before
+    """
+    rollout = rollout or generate_move_smart
+    if cutoff is None:
+        while not game.terminal_test(state):
+            state = game.result(state, rollout(state, game))
+        return state
+    # a trick that is under way counts as one
+    stop = len(state['taken1']) + len(state['taken2']) + 2 * cutoff
+    while len(state['taken1']) + len(state['taken2']) < stop and not game.terminal_test(state):
+        state = game.result(state, rollout(state, game))
+    return state
+
+def playout_inplace(state, game, rollout=None, cutoff=None):
+    """
+    Same as playout, with the moves made on state by game.apply. Returns their undo tokens
+    """
+    rollout = rollout or generate_move_smart
+    stop = 40 if cutoff is None else len(state['taken1']) + len(state['taken2']) + 2 * cutoff
+    tokens = []
+    while len(state['taken1']) + len(state['taken2']) < stop and not game.terminal_test(state):
+        tokens.append(game.apply(state, rollout(state, game)))
+    return tokens
+
+class DeterminizedEvaluator:
+    """
+    Evaluator for the searches where the opponent of player holds every card player has not seen,
+    and the same cards are still in the deck: each state is first determinized from the view of
+    player (see determinize), then valued by evaluator, or by heuristic_evaluator for utility if
+    evaluator is None
+    """
+
+    def __init__(self, evaluator=None, utility=None, player=1):
+        self.evaluator = evaluator
+        self.utility = utility
+        self.player = player
+
+    def __call__(self, states, players):
+        states = [determinize(state, self.player) for state in states]
+        if self.evaluator is None:
+            return heuristic_evaluator(states, players, self.utility)
+        return self.evaluator(states, players)
+
+def leaf_values(states, game, players, evaluator=None, utility=None):
+    """
+    Returns the values of states for players (one player for each state): the utility of the
+    final states (by utility, a utilities.Utility, or the one of game), and for the others the
+    estimate of evaluator (see value_network), called once on all of them. The evaluator is
+    heuristic_evaluator for the same utility if not given
+    """
+    utility = utility or game.utility_function
+    values = [utility(state, player) if game.terminal_test(state) else None for state, player in zip(states, players)]
+    unfinished = [i for i, value in enumerate(values) if value is None]
+    if unfinished:
+        unfinished_states, unfinished_players = [states[i] for i in unfinished], [players[i] for i in unfinished]
+        if evaluator is None:
+            estimates = heuristic_evaluator(unfinished_states, unfinished_players, utility)
+        else:
+            estimates = evaluator(unfinished_states, unfinished_players)
+        for i, estimate in zip(unfinished, estimates):
+            values[i] = float(estimate)
+    return values
+
+def player_values(states, game, evaluator=None, utility=None):
+    """
+    Returns the values of states for both players, indexed by player: (0, v, 1 - v) where v is the
+    value of player 1 (see leaf_values). The utilities of the two players add up to 1, so each state
+    is evaluated once and both values come from the same estimate
+    """
+    return [(0, v, 1 - v) for v in leaf_values(states, game, [1] * len(states), evaluator, utility)]
+
+def simulate_move(state, game, move, player, determinized=False, rollout=None, cutoff=None, evaluator=None, utility=None):
+    """
+    Plays move from state with a random hand for player 2, then plays the game to the end
+    with the rollout policy (generate_move_smart if not given, see playout_policies).
+    Returns the utility of the final state for player (by utility, a utilities.Utility, or the one of
+    game). With cutoff, the game is only played for cutoff more tricks, and the value of the state
+    reached is estimated by evaluator.
+    If determinized, state is already a sampled copy (see DeterminizationSampler) and is played as it is
+    """
+    if determinized:
+        state_copy = state
+    else:
+        # Create a copy of the state
+        state_copy = copy_state(state)
+
+        # randomise a hand for the second player
+        if len(state_copy['table']) == 0:
+            hand_2_new = random.sample(state_copy['hand2'], 3)
+        else: 
+            hand_2_new = random.sample(state_copy['hand2'], 2)
+
+        state_copy['hand2'] = hand_2_new  
+
+    # Play the move
+    state_copy = game.result(state_copy, move)
+
+    # Simulate the game
+    state_copy = playout(state_copy, game, rollout, cutoff)
+    return leaf_values([state_copy], game, [player], evaluator, utility)[0]
+
+# with a deadline, the games played by the rollout policy between two looks at the clock
+DEADLINE_BATCH = 16
+
+def count_wins(state, game, moves, n_sim, seed=None, deadline=None, vectorized=False, batch_size=256, sampler=None,
+               rollout=None, cutoff=None, evaluator=None, utility=None):
+    """
+    Simulates n_sim games for each move and returns two dictionaries, the number of wins
+    (the sum of the utilities) and the number of simulations of each move. If deadline (a time.time()
+    value) is given, the moves are simulated in turn until it passes instead.
+    With vectorized, the games are played batch_size at a time by batch_rollout.
+    If sampler (a DeterminizationSampler of state) is given, every game is played on one of its
+    determinizations, sampled batch_size at a time. rollout, cutoff, evaluator and utility are those of
+    simulate_move, and with a sampler and a cutoff the states reached are evaluated batch_size at a
+    time (DEADLINE_BATCH at a time with a deadline). The vectorized games always use the greedy policy of generate_move_smart to the end.
+    Runs in the worker processes of my_monte_carlo_tree_search, each one with its own seed
+    """
+    if seed is not None:
+        random.seed(seed)
+    # from the global generator if there is no seed, so that a seeded game is reproducible
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64)) if vectorized or sampler else None
+    if sampler is not None:
+        sampler.rng = rng
+    player = game.to_move(state)
+    determinizations = []
+
+    wins = {move: 0 for move in moves}
+    plays = {move: 0 for move in moves}
+    # the evaluations of the cut off rollouts are batched, DEADLINE_BATCH at a time with a deadline
+    batched = vectorized or (cutoff is not None and evaluator is not None and sampler is not None)
+    if deadline is not None and not vectorized:
+        batch_size = min(batch_size, DEADLINE_BATCH)
+    rounds = 0
+    while (rounds < n_sim) if deadline is None else (rounds == 0 or time.time() < deadline):
+        size = 1
+        if batched:
+            size = batch_size if deadline is not None else min(batch_size, n_sim - rounds)
+        for move in moves:
+            if vectorized:
+                wins[move] += float(batch_wins(state, size, move, rng, sampler, utility or game.utility_function).sum())
+            elif batched:
+                wins[move] += simulate_batch(state, game, move, size, sampler, rng, False, rollout, cutoff, evaluator, utility)
+            elif sampler is not None:
+                if not determinizations:
+                    determinizations = sampler.sample(batch_size)
+                wins[move] += simulate_move(determinizations.pop(), game, move, player, True, rollout, cutoff, evaluator, utility)
+            # If the player wins, add one to the number of wins
+            else:
+                wins[move] += simulate_move(state, game, move, player, False, rollout, cutoff, evaluator, utility)
+            plays[move] += size
+        rounds += size
+    return wins, plays
+
+def paired_best(outcomes, z):
+    """
+    outcomes is an array (games, moves) of the results of every move on the same games.
+    Returns the index of the move with the most wins and whether it is better than every
+    other move with z standard errors of the mean of the paired differences to spare
+    """
+    best = int(outcomes.sum(axis=0).argmax())
+    n = len(outcomes)
+    if n < 2:
+        return best, False
+    diffs = outcomes[:, [best]].astype(np.float64) - np.delete(outcomes, best, axis=1)
+    mean = diffs.mean(axis=0)
+    se = diffs.std(axis=0, ddof=1) / np.sqrt(n)
+    return best, bool((mean - z * se > 0).all())
+
+def count_wins_paired(state, game, moves, n_sim, sampler, seed=None, deadline=None, vectorized=False, batch_size=256,
+                      z=None, min_sim=100, rollout=None, cutoff=None, evaluator=None, utility=None):
+    """
+    Same as count_wins, with common random numbers: every move is simulated on the same
+    determinization, and without vectorized with the same seed of the random draws.
+    Returns an array (games, moves) of the utility of the move in each game.
+    If z is given, stops after at least min_sim games once the best move is better than
+    each other move with z standard errors to spare (see paired_best), checked every batch_size games.
+    With a deadline, the games that are not vectorized are played DEADLINE_BATCH at a time, so that
+    the clock is read often enough
+    """
+    if seed is not None:
+        random.seed(seed)
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+    sampler.rng = rng
+    player = game.to_move(state)
+
+    if deadline is not None and not vectorized:
+        batch_size = min(batch_size, DEADLINE_BATCH)
+    batches = []
+    rounds = 0
+    while (rounds < n_sim) if deadline is None else (rounds == 0 or time.time() < deadline):
+        size = batch_size if deadline is not None else min(batch_size, n_sim - rounds)
+        if vectorized:
+            batch = batch_wins_paired(state, size, moves, rng, sampler, utility or game.utility_function)
+        else:
+            batch = np.zeros((size, len(moves)))
+            determinizations = sampler.sample(size)
+            draw_seeds = rng.integers(2 ** 63, size=size)
+            for j, move in enumerate(moves):
+                ends = []
+                for determinization, draw_seed in zip(determinizations, draw_seeds):
+                    # the same cards are drawn after every move
+                    random.seed(int(draw_seed))
+                    ends.append(playout(game.result(determinization, move), game, rollout, cutoff))
+                batch[:, j] = leaf_values(ends, game, [player] * size, evaluator, utility)
+        batches.append(batch)
+        rounds += size
+        if z is not None and rounds >= min_sim and paired_best(np.concatenate(batches), z)[1]:
+            break
+    return np.concatenate(batches)
+
+def simulate_batch(state, game, move, n, sampler, rng, vectorized=False, rollout=None, cutoff=None, evaluator=None,
+                   utility=None):
+    """
+    Simulates n games of move on determinizations of sampler and returns the number of wins
+    (the sum of the utilities). With cutoff, the n states reached are evaluated in one call of evaluator
+    """
+    if vectorized:
+        return float(batch_wins(state, n, move, rng, sampler, utility or game.utility_function).sum())
+    player = game.to_move(state)
+    ends = [playout(game.result(d, move), game, rollout, cutoff) for d in sampler.sample(n)]
+    return sum(leaf_values(ends, game, [player] * n, evaluator, utility))
+
+def win_confidence(wins, plays, best):
+    """
+    Returns the confidence that move best has a higher win rate than every other move:
+    the smallest of the normal approximations of P(best is better than move)
     """
-    # the evaluation is points in players hand minus points in opponent's hand
+    # the win rates are smoothed so that 0 and all wins still have a variance
+    rate = {move: (wins[move] + 1) / (plays[move] + 2) for move in wins}
+    confidence = 1.0
+    for move in wins:
+        if move == best:
+            continue
+        se = math.sqrt(rate[best] * (1 - rate[best]) / (plays[best] + 2) + rate[move] * (1 - rate[move]) / (plays[move] + 2))
+        confidence = min(confidence, 0.5 * (1 + math.erf((rate[best] - rate[move]) / (se * math.sqrt(2)))))
+    return confidence
 
-    # get the points in the hands
-    eval = sum(get_card_value(card) for card in state['hand' + str(player_number)]) - sum(get_card_value(card) for card in state['hand' + str(3 - player_number)])
-    return eval
+# the methods of allocate_simulations
+ALLOCATIONS = ('halving', 'ucb', 'lucb')
 
-def my_monte_carlo_tree_search(state, game, n_sim):
+def allocate_simulations(state, game, moves, budget, method='halving', sampler=None, seed=None, vectorized=False,
+                         batch_size=32, delta=0.05, rollout=None, cutoff=None, evaluator=None, utility=None, deadline=None):
+    """
+    Spends at most budget simulations on moves (at least one per move), giving more of them to the promising moves.
+    Returns the number of wins and the number of simulations of each move, and the chosen move.
+    If deadline (a time.time() value) is given, the simulations are played batch_size at a time and stop
+    once it passes, after the first batch of each move, and the move is chosen from those played so far.
+    method is one of
+    'halving': successive halving, the budget is split evenly over log2(moves) rounds, and after
+        each round the worse half of the moves is dropped. The chosen move is the one left
+    'ucb': batch_size simulations at a time of the move with the highest UCB1. The chosen move
+        is the one with the most simulations
+    'lucb': LUCB1, batch_size simulations at a time of the move with the highest win rate and of
+        its strongest challenger, until their confidence intervals at level delta are apart.
+        The chosen move is the one with the highest win rate
+    """
+    if method not in ALLOCATIONS:
+        raise ValueError("Unknown allocation method: {}".format(method))
+    if seed is not None:
+        random.seed(seed)
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+    if sampler is None:
+        sampler = DeterminizationSampler(state)
+    sampler.rng = rng
+    wins = {move: 0 for move in moves}
+    plays = {move: 0 for move in moves}
+
+    def expired():
+        return deadline is not None and time.time() >= deadline
+
+    def pull(move, n):
+        """simulate move n times, in batches when there is a deadline, and return how many were played"""
+        played = 0
+        while played < n and (played == 0 or not expired()):
+            size = n - played if deadline is None else min(batch_size, n - played)
+            wins[move] += simulate_batch(state, game, move, size, sampler, rng, vectorized, rollout, cutoff, evaluator, utility)
+            plays[move] += size
+            played += size
+        return played
+
+    def rate(move):
+        return wins[move] / plays[move] if plays[move] else 0.0
+
+    if method == 'halving':
+        alive = list(moves)
+        rounds = max(1, math.ceil(math.log2(len(moves))))
+        for _ in range(rounds):
+            n = max(1, budget // (len(alive) * rounds))
+            for move in alive:
+                pull(move, n)
+            if expired():
+                return wins, plays, max(alive, key=rate)
+            alive = sorted(alive, key=rate, reverse=True)[:max(1, math.ceil(len(alive) / 2))]
+        return wins, plays, alive[0]
+
+    # every move once, then one batch at a time
+    n = max(1, min(batch_size, budget // len(moves)))
+    spent = sum(pull(move, n) for move in moves)
+    if method == 'ucb':
+        while spent < budget and not expired():
+            t = sum(plays.values())
+            n = min(batch_size, budget - spent)
+            spent += pull(max(moves, key=lambda m: rate(m) + math.sqrt(2 * math.log(t) / plays[m])), n)
+        return wins, plays, max(moves, key=lambda m: plays[m])
+
+    # 'lucb'
+    def radius(move, t):
+        return math.sqrt(math.log(5 * len(moves) * t ** 4 / (4 * delta)) / (2 * plays[move]))
+    t = 1
+    while budget - spent >= 2 and not expired():
+        best = max(moves, key=rate)
+        challenger = max((m for m in moves if m != best), key=lambda m: rate(m) + radius(m, t))
+        if rate(best) - radius(best, t) > rate(challenger) + radius(challenger, t):
+            break
+        n = min(batch_size, (budget - spent) // 2)
+        spent += pull(best, n) + pull(challenger, n)
+        t += 1
+    return wins, plays, max(moves, key=rate)
+
+def split_simulations(n_sim, n_chunks):
+    """
+    Splits n_sim simulations into n_chunks counts that differ by at most one
+    """
+    return [n_sim // n_chunks + (1 if i < n_sim % n_chunks else 0) for i in range(n_chunks)]
+
+def my_monte_carlo_tree_search(state, game, n_sim, n_workers=1, executor=None, time_limit_ms=None, info=None, vectorized=False,
+                               sampler=None, common_random_numbers=False, z=None, allocation=None, budget=None, stats=None,
+                               rollout=None, cutoff=None, evaluator=None, utility=None):
     """
     Monte Carlo Tree Search algorithm
+
+    With n_workers > 1 the n_sim simulations of each move are split among n_workers
+    processes of executor (a concurrent.futures.ProcessPoolExecutor, created for this
+    call if not given), each with an independent seed, and the wins are added up.
+
+    If time_limit_ms is given, every process simulates the moves in turn until the time
+    is over, instead of n_sim times. If info is a dictionary, the total number of
+    simulations is stored in info['iterations'].
+
+    The simulations are played on determinizations of what player 1 has seen, drawn by
+    sampler (a DeterminizationSampler of state, made here if not given). With vectorized,
+    they are played in NumPy batches by batch_rollout, otherwise with the rollout policy
+    (generate_move_smart if not given, see playout_policies). With cutoff, those are only played
+    for cutoff more tricks after the move, and the states reached are valued by evaluator (a
+    value_network.ValueNetwork, or any function of a list of states and the players they are seen
+    from; heuristic_evaluator if not given), many at a time. The vectorized simulations play to the end.
+    utility is the utility of the simulations (a name or a Utility of utilities.py), the one of game
+    if not given, and the "wins" of a move are the sum of its utilities.
+
+    With common_random_numbers, all the moves are simulated on the same determinizations
+    (see count_wins_paired), so a difference between two moves is not hidden by the luck
+    of the deal. If z is given, the simulations stop early once the best move is better than
+    the others by z standard errors of the paired differences (each process decides for its
+    own simulations), and info['separated'] tells if that happened.
+
+    With allocation ('halving', 'ucb' or 'lucb', see allocate_simulations), a total of budget
+    simulations (n_sim for each move if not given) is spread over the moves in this process,
+    more of them to the better moves, until time_limit_ms is over if it is given, and
+    info['confidence'] is the confidence that the chosen move is the best one (see win_confidence).
+    The allocation runs in a single process, so it cannot be combined with n_workers > 1.
+
+    If stats is a search_stats.SearchStats, the rollouts, copies and simulation time are
+    counted into it (the calls to result only for the simulations of this process), and the
+    simulations and wins of each move are stored in stats.root_scores.
     """   
     # Explore the possible moves given the state
     possible_moves = game.actions(state)
 
     # If there is only one possible move, return it
     if len(possible_moves) == 1:
+        if info is not None:
+            info['iterations'] = 0
         return possible_moves[0]
     
-    # Create a dictionary to store the number of wins for each move
-    wins = {}
     player = game.to_move(state)
 
     if player != 1:
         raise Exception("Player to move is not 1")
+    if allocation is not None and n_workers > 1:
+        raise ValueError("allocation runs in a single process, it cannot be used with n_workers > 1")
 
-    # For each possible move, simulate n_sim games and store the number of wins
-    for move in possible_moves:
-        wins[move] = 0
-
-        for sim in range(n_sim):
-            # Create a copy of the state
-            state_copy = deepcopy(state)
-
-            if len(state_copy['table']) == 0:
-                hand_2_new = random.sample(state_copy['hand2'], 3)
-            else: 
-                hand_2_new = random.sample(state_copy['hand2'], 2)
-
-            state_copy['hand2'] = hand_2_new  
+    deadline = None if time_limit_ms is None else time.time() + time_limit_ms / 1000
+    utility = make_utility(utility)
+    if sampler is None:
+        sampler = DeterminizationSampler(state)
+    if stats is not None:
+        start = time.perf_counter()
+        if n_workers == 1 or allocation is not None:
+            game = CountingGame(game, stats)
 
-            # Play the move
-            state_copy = game.result(state_copy, move)
+    if allocation is not None:
+        budget = budget if budget is not None else n_sim * len(possible_moves)
+        wins, plays, move = allocate_simulations(state, game, possible_moves, budget, allocation, sampler, vectorized=vectorized,
+                                                   rollout=rollout, cutoff=cutoff, evaluator=evaluator, utility=utility,
+                                                   deadline=deadline)
+        if info is not None:
+            info['iterations'] = sum(plays.values())
+            info['confidence'] = win_confidence(wins, plays, move)
+        if stats is not None:
+            count_simulations(stats, wins, plays, vectorized, start)
+        return move
 
-            # randomise a hand for the second player
-               
+    # For each possible move, simulate n_sim games and store the number of wins
+    if common_random_numbers:
+        if n_workers == 1:
+            outcomes = count_wins_paired(state, game, possible_moves, n_sim, sampler, deadline=deadline, vectorized=vectorized, z=z,
+                                         rollout=rollout, cutoff=cutoff, evaluator=evaluator, utility=utility)
+        else:
+            own_executor = executor is None
+            if own_executor:
+                executor = ProcessPoolExecutor(n_workers)
+            try:
+                chunks = split_simulations(n_sim, n_workers) if deadline is None else [n_sim] * n_workers
+                futures = [executor.submit(count_wins_paired, state, game, possible_moves, chunk, sampler, random.getrandbits(64),
+                                           deadline, vectorized, z=z, rollout=rollout, cutoff=cutoff, evaluator=evaluator, utility=utility)
+                           for chunk in chunks if chunk > 0]
+                outcomes = np.concatenate([future.result() for future in futures])
+            finally:
+                if own_executor:
+                    executor.shutdown()
+        wins = dict(zip(possible_moves, outcomes.sum(axis=0).tolist()))
+        plays = {move: len(outcomes) for move in possible_moves}
+        if info is not None:
+            info['separated'] = paired_best(outcomes, z)[1] if z is not None else False
+    elif n_workers == 1:
+        wins, plays = count_wins(state, game, possible_moves, n_sim, deadline=deadline, vectorized=vectorized, sampler=sampler,
+                                 rollout=rollout, cutoff=cutoff, evaluator=evaluator, utility=utility)
+    else:
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(n_workers)
+        try:
+            chunks = split_simulations(n_sim, n_workers) if deadline is None else [n_sim] * n_workers
+            futures = [executor.submit(count_wins, state, game, possible_moves, chunk, random.getrandbits(64), deadline, vectorized,
+                                       sampler=sampler, rollout=rollout, cutoff=cutoff, evaluator=evaluator, utility=utility)
+                       for chunk in chunks if chunk > 0]
+            wins = {move: 0 for move in possible_moves}
+            plays = {move: 0 for move in possible_moves}
+            for future in futures:
+                chunk_wins, chunk_plays = future.result()
+                for move in possible_moves:
+                    wins[move] += chunk_wins[move]
+                    plays[move] += chunk_plays[move]
+        finally:
+            if own_executor:
+                executor.shutdown()
 
-            # Simulate the game
-            while not game.terminal_test(state_copy):
-                # print("Deck length: ", len(state_copy['deck']))
-                total_cards = len(state_copy['hand1']) + len(state_copy['hand2']) + len(state_copy['table']) + len(state_copy['deck']) + len(state_copy['taken1']) + len(state_copy['taken2'])
-                action = generate_move_smart(state_copy, game)
-                state_copy = game.result(state_copy, action)
+    if info is not None:
+        info['iterations'] = sum(plays.values())
+    if stats is not None:
+        count_simulations(stats, wins, plays, vectorized, start)
 
-            # If the player wins, add one to the number of wins
-            if game.utility(state_copy, player) == 1:
-                wins[move] += 1
+    # Return the move with the highest share of wins
+    return max(wins, key=lambda move: wins[move] / plays[move])
 
-    # Return the move with the highest number of wins
-    print("Wins: ", wins)
-    return max(wins, key=wins.get)
+def count_simulations(stats, wins, plays, vectorized, start):
+    """
+    Adds the simulations of my_monte_carlo_tree_search that started at start (a time.perf_counter() value) to stats
+    """
+    simulations = sum(plays.values())
+    stats.iterations += simulations
+    stats.rollouts += simulations
+    # every simulation that is not vectorized plays on its own copy of a determinization
+    if not vectorized:
+        stats.copies += simulations
+    stats.reach(1)
+    stats.root_scores = {move: (plays[move], wins[move]) for move in plays}
+    elapsed = time.perf_counter() - start
+    stats.time['simulate'] += elapsed
+    stats.total_time += elapsed
 
 def evaluate_move(move, state_copy):
     # calculate the total value of the trick
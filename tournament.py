@@ -0,0 +1,169 @@
+"""
+Headless tournament between two players of players.py.
+
+Every deal is played twice with the players in swapped seats, so both get the
+same cards. Games are seeded, print nothing and can be spread over a process pool.
+
+    python tournament.py MyMonteCarloTreeSearchPlayer:simulations=100 SmartPlayer -n 1000 --workers 16
+
+A player is given as ClassName or ClassName:arg=value,arg=value, the values are Python literals.
+"""
+
+import argparse
+import ast
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import players
+from briscola_game import Briscola
+from cards import CARD_INDEX, POINTS
+from tools import copy_state, split_simulations
+
+
+def make_player(spec):
+    """Return the player described by 'ClassName' or 'ClassName:arg=value,arg=value'."""
+    name, _, args = spec.partition(':')
+    kwargs = {}
+    for arg in filter(None, args.split(',')):
+        key, _, value = arg.partition('=')
+        kwargs[key.strip()] = ast.literal_eval(value.strip())
+    return getattr(players, name)(**kwargs)
+
+
+def close_player(player):
+    """Shut down the process pool of player, for the players that have one (see MonteCarloTreeSearchPlayer.close)."""
+    close = getattr(player, 'close', None)
+    if close is not None:
+        close()
+
+
+def deal(seed):
+    """Return the initial state of the game with the given seed."""
+    return Briscola.new_game(seed)
+
+
+def mirror(state):
+    """Return a copy of state where player 1 and player 2 are swapped."""
+    new_state = copy_state(state)
+    new_state['hand1'], new_state['hand2'] = new_state['hand2'], new_state['hand1']
+    new_state['taken1'], new_state['taken2'] = new_state['taken2'], new_state['taken1']
+    new_state['player'] = 3 - state['player']
+    return new_state
+
+
+def points(cards):
+    """Return the points of a list of cards."""
+    return sum(POINTS[CARD_INDEX[card]] for card in cards)
+
+
+def play_headless(game, player1, player2, state, record=None):
+    """
+    Play a game from state without printing and return the points of player 1 and player 2.
+    Each player sees the game as player 1, as the MCTS players expect.
+    If record is a list, the states of the game, from state to the final one, are appended to it.
+    """
+    while not game.terminal_test(state):
+        if record is not None:
+            record.append(state)
+        if state['player'] == 1:
+            move = player1.generate_move(copy_state(state), game)
+        else:
+            move = player2.generate_move(mirror(state), game)
+        state = game.result(state, move)
+    if record is not None:
+        record.append(state)
+    return points(state['taken1']), points(state['taken2'])
+
+
+def play_games(spec_a, spec_b, games, record=None):
+    """
+    Play the games numbered games, and return the point differential of player a in each one.
+    Game i is the deal of seed i // 2, with player a in seat 1 if i is even and in seat 2 if it is odd.
+    If record is a list, the states of each game are appended to it as a list, see play_headless.
+    """
+    game = Briscola()
+    player_a, player_b = make_player(spec_a), make_player(spec_b)
+    differentials = []
+    try:
+        for i in games:
+            # the players draw their random numbers from the global generator
+            random.seed(i)
+            state = deal(i // 2)
+            states = [] if record is not None else None
+            if i % 2 == 0:
+                points_a, points_b = play_headless(game, player_a, player_b, state, states)
+            else:
+                points_b, points_a = play_headless(game, player_b, player_a, state, states)
+            if record is not None:
+                record.append(states)
+            differentials.append(points_a - points_b)
+    finally:
+        close_player(player_a)
+        close_player(player_b)
+    return differentials
+
+
+def summarize(differentials, seconds):
+    """Return the statistics of player a from the point differentials of its games."""
+    n = len(differentials)
+    wins = sum(1 for d in differentials if d > 0)
+    draws = sum(1 for d in differentials if d == 0)
+    # a draw counts as half a win
+    win_rate = (wins + 0.5 * draws) / n
+    mean = sum(differentials) / n
+    variance = sum((d - mean) ** 2 for d in differentials) / (n - 1) if n > 1 else 0.0
+    return {'games': n,
+            'wins': wins,
+            'draws': draws,
+            'losses': n - wins - draws,
+            'win_rate': win_rate,
+            'win_rate_ci95': 1.96 * math.sqrt(win_rate * (1 - win_rate) / n),
+            'mean_differential': mean,
+            'mean_differential_ci95': 1.96 * math.sqrt(variance / n),
+            'games_per_sec': n / seconds if seconds > 0 else float('inf')}
+
+
+def run_tournament(spec_a, spec_b, n_games, first_deal=0, n_workers=1):
+    """
+    Play n_games games between the players described by spec_a and spec_b, starting
+    from the deal with seed first_deal (game number 2 * first_deal, so that both seats of
+    every deal are played), on n_workers processes. Return the statistics of player a.
+    """
+    games = list(range(2 * first_deal, 2 * first_deal + n_games))
+    start = time.perf_counter()
+    if n_workers == 1:
+        differentials = play_games(spec_a, spec_b, games)
+    else:
+        chunks, begin = [], 0
+        # many small chunks keep the workers busy until the end
+        for size in split_simulations(n_games, n_workers * 8):
+            chunks.append(games[begin:begin + size])
+            begin += size
+        differentials = []
+        with ProcessPoolExecutor(n_workers) as executor:
+            for chunk in executor.map(play_games, [spec_a] * len(chunks), [spec_b] * len(chunks), [c for c in chunks if c]):
+                differentials.extend(chunk)
+    return summarize(differentials, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a headless Briscola tournament between two players.")
+    parser.add_argument('player_a', help="ClassName or ClassName:arg=value,arg=value")
+    parser.add_argument('player_b', help="ClassName or ClassName:arg=value,arg=value")
+    parser.add_argument('-n', '--games', type=int, default=1000, help="number of games, each deal is played twice")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first deal")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes")
+    args = parser.parse_args()
+
+    stats = run_tournament(args.player_a, args.player_b, args.games, args.seed, args.workers)
+    print("{} vs {}".format(args.player_a, args.player_b))
+    print("Games: {games} (wins {wins}, draws {draws}, losses {losses})".format(**stats))
+    print("Win rate: {win_rate:.4f} +/- {win_rate_ci95:.4f}".format(**stats))
+    print("Mean point differential: {mean_differential:.2f} +/- {mean_differential_ci95:.2f}".format(**stats))
+    print("Games per second: {games_per_sec:.1f}".format(**stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Training of the value network of value_network.py on self-play games.
+
+    python train_value_network.py --games 20000 --rollout heavy --output value.npz
+    python train_value_network.py --tournament "MyMonteCarloTreeSearchPlayer:simulations=50" SmartPlayer --games 500 --output value.npz
+
+The games are played from deals of Briscola.new_games by a rollout policy of
+playout_policies against itself, or recorded from a tournament between two players
+of players.py (see tournament.play_games). A few positions of each game are kept,
+seen from both players, with the utility the player got at the end of the game as
+the target, by default the win of utilities.py. The saved network is used by the searches as
+
+    MonteCarloTreeSearchPlayer:cutoff=2,evaluator='value.npz'
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from briscola_game import Briscola
+from playout_policies import make_rollout
+from tournament import play_games
+from utilities import UTILITIES
+from value_network import ValueNetwork, encode
+
+
+def self_play_games(n_games, rollout='heavy', seed=0):
+    """Return the states of n_games games played by the rollout policy called rollout against itself,
+    as a list of the states of each game from the deal to the final one."""
+    game = Briscola()
+    policy = make_rollout(rollout)
+    random.seed(seed)
+    games = []
+    for state in Briscola.new_games(n_games, seed):
+        states = [state]
+        while not game.terminal_test(state):
+            state = game.result(state, policy(state, game))
+            states.append(state)
+        games.append(states)
+    return games
+
+
+def training_data(games, positions=4, seed=0, utility='win'):
+    """
+    Return the features and targets of positions states drawn at random from each game of games,
+    each one seen from both players: X is an array (n, N_FEATURES), y the utility of the player
+    at the end of the game (see utilities).
+    """
+    game = Briscola(utility=utility)
+    rng = random.Random(seed)
+    states, players, targets = [], [], []
+    for game_states in games:
+        final = game_states[-1]
+        for state in rng.sample(game_states[:-1], min(positions, len(game_states) - 1)):
+            for player in (1, 2):
+                states.append(state)
+                players.append(player)
+                targets.append(game.utility(final, player))
+    return encode(states, players), np.array(targets, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the value network on self-play games.")
+    parser.add_argument('--games', type=int, default=20000, help="number of games")
+    parser.add_argument('--rollout', default='heavy', help="rollout policy of the self-play games, see playout_policies")
+    parser.add_argument('--tournament', nargs=2, metavar='PLAYER', help="record the games of a tournament between two players instead")
+    parser.add_argument('--utility', default='win', choices=UTILITIES, help="target of the network, see utilities")
+    parser.add_argument('--positions', type=int, default=4, help="positions kept from each game")
+    parser.add_argument('--hidden', type=int, default=64, help="hidden units, 0 for a linear model")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--lr', type=float, default=1e-3, help="learning rate of Adam")
+    parser.add_argument('--validation', type=float, default=0.1, help="share of the games held out")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='value.npz', help="file the network is saved to")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.tournament:
+        games = []
+        play_games(args.tournament[0], args.tournament[1], range(args.seed, args.seed + args.games), games)
+    else:
+        games = self_play_games(args.games, args.rollout, args.seed)
+    # the validation positions come from other games than the training ones
+    split = int(len(games) * (1 - args.validation))
+    X, y = training_data(games[:split], args.positions, args.seed, args.utility)
+    validation = training_data(games[split:], args.positions, args.seed + 1, args.utility) if split < len(games) else None
+    print("{} games, {} positions in {:.1f}s".format(len(games), len(X), time.perf_counter() - start))
+
+    network = ValueNetwork(args.hidden, args.seed)
+    network.fit(X, y, args.epochs, args.batch_size, args.lr, seed=args.seed, validation=validation, verbose=True)
+    network.save(args.output)
+    print("Saved {!r} to {}".format(network, args.output))
+
+
+if __name__ == '__main__':
+    main()
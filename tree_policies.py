@@ -0,0 +1,141 @@
+"""
+Tree policies for the array tree of mct_tree.MCT_Tree.
+
+A tree policy picks the child to follow during the selection phase of MCTS.
+It scores all the children of a node at once from the arrays of the tree, and
+select returns the legal child with the highest score. The policies are passed
+to games4e.monte_carlo_tree_search_pool, and benchmarks.py compares their speed.
+
+    UCB1              Q + C sqrt(ln N / n)
+    UCB1Tuned         UCB1 with the exploration scaled by the variance of the utility
+    PUCT              Q + C P sqrt(N) / (1 + n), with the prior P of each move
+    ThompsonSampling  a draw from the Beta posterior of the win rate of each child
+
+The utilities are assumed to be in [0, 1], as the ones of Briscola.utility.
+"""
+
+import math
+
+import numpy as np
+
+from card_tables import VALUE, WINNER
+from cards import CARD_INDEX, SUIT_INDEX
+
+
+class TreePolicy:
+    """Base class of the tree policies. Subclasses define scores, and priors if they use them."""
+
+    def scores(self, tree, node, first, last):
+        """Return the scores of the children first .. last - 1 of node."""
+        raise NotImplementedError
+
+    def priors(self, state, actions):
+        """Return the prior probabilities of actions in state, stored in the tree when a node is expanded.
+        None means uniform."""
+        return None
+
+    def select(self, tree, node, legal=None):
+        """Return the child of node with the highest score. If legal (see MCT_Tree.legal_mask)
+        is given, only the children with a legal move count. Return -1 if there is no such child."""
+        first = tree.first_child[node]
+        last = first + tree.n_children[node]
+        scores = self.scores(tree, node, first, last)
+        if legal is not None:
+            scores[~legal[tree.move[first:last]]] = -np.inf
+        best = scores.argmax()
+        if scores[best] == -np.inf:
+            return -1
+        return first + best
+
+    def __repr__(self):
+        args = ('{}={}'.format(k, v.__name__ if callable(v) else v) for k, v in vars(self).items() if not k.startswith('_'))
+        return '{}({})'.format(type(self).__name__, ', '.join(args))
+
+
+class UCB1(TreePolicy):
+    """UCB1 of Auer et al., the same as utils4e.ucb."""
+
+    def __init__(self, C=1.4):
+        self.C = C
+
+    def scores(self, tree, node, first, last):
+        # the unvisited children have an infinite inv_sqrt_N, so they come first
+        return tree.Q[first:last] + (self.C * math.sqrt(tree.log_N[node]) + 1e-12) * tree.inv_sqrt_N[first:last]
+
+
+class UCB1Tuned(TreePolicy):
+    """UCB1-Tuned of Auer et al.: the exploration term uses the variance of the utility
+    of each child, bounded by 1/4, the largest variance of a utility in [0, 1]."""
+
+    def __init__(self, C=1.0):
+        self.C = C
+
+    def scores(self, tree, node, first, last):
+        n = tree.N[first:last]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_over_n = tree.log_N[node] / n
+            variance = tree.U2[first:last] / n - tree.Q[first:last] ** 2 + np.sqrt(2 * log_over_n)
+            scores = tree.Q[first:last] + self.C * np.sqrt(log_over_n * np.minimum(0.25, variance))
+        scores[n == 0] = np.inf
+        return scores
+
+
+class PUCT(TreePolicy):
+    """PUCT of AlphaZero: the exploration of each child is weighted by the prior probability
+    of its move. prior(state, actions) returns the probabilities, uniform if prior is None."""
+
+    def __init__(self, C=1.5, prior=None):
+        self.C = C
+        self.prior = prior
+
+    def priors(self, state, actions):
+        return None if self.prior is None else self.prior(state, actions)
+
+    def scores(self, tree, node, first, last):
+        n = tree.N[first:last]
+        return tree.Q[first:last] + self.C * tree.P[first:last] * math.sqrt(tree.N[node]) / (1 + n)
+
+
+class ThompsonSampling(TreePolicy):
+    """Thompson sampling: each child is scored with a draw from Beta(alpha + U, beta + N - U),
+    the posterior of its win rate. seed seeds the NumPy generator of the draws."""
+
+    def __init__(self, alpha=1.0, beta=1.0, seed=None):
+        self.alpha = alpha
+        self.beta = beta
+        self._rng = np.random.default_rng(seed)
+
+    def scores(self, tree, node, first, last):
+        u = np.clip(tree.U[first:last], 0, None)
+        failures = np.clip(tree.N[first:last] - u, 0, None)
+        return self._rng.beta(self.alpha + u, self.beta + failures)
+
+
+def greedy_prior(state, actions, weight=0.5):
+    """Prior that gives weight to the move of tools.generate_move_smart, and the rest to all
+    the moves evenly: the lowest card when leading, the best trick value when answering."""
+    if state['table']:
+        lead = CARD_INDEX[state['table'][0]]
+        trump = SUIT_INDEX[state['briscola'][1]]
+
+        def trick_value(move):
+            card = CARD_INDEX[move]
+            total = VALUE[lead] + VALUE[card]
+            return -total if WINNER[trump][lead][card] else total
+        best = max(range(len(actions)), key=lambda i: trick_value(actions[i]))
+    else:
+        best = min(range(len(actions)), key=lambda i: VALUE[CARD_INDEX[actions[i]]])
+    priors = np.full(len(actions), (1 - weight) / len(actions))
+    priors[best] += weight
+    return priors
+
+
+POLICIES = {'UCB1': UCB1, 'UCB1Tuned': UCB1Tuned, 'PUCT': PUCT, 'ThompsonSampling': ThompsonSampling}
+
+
+def make_policy(name, **kwargs):
+    """Return the policy with the class name name, built with kwargs.
+    For PUCT, prior='greedy' stands for greedy_prior."""
+    if kwargs.get('prior') == 'greedy':
+        kwargs['prior'] = greedy_prior
+    return POLICIES[name](**kwargs)
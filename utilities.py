@@ -0,0 +1,63 @@
+"""
+Utilities of a final Briscola state: the reward that the searches maximize.
+
+    'win'     1 for a win (61 points or more), 0.5 for a 60-60 draw, 0 for a loss
+    'margin'  the normalized point difference, 0.5 + (points - opponent's points) / 240,
+              which is the share of the 120 points taken by the player
+    'blend'   weight * win + (1 - weight) * margin
+
+They are all in [0, 1] and the utilities of the two players add up to 1, so the tree
+policies keep their exploration constants whatever the utility. 'win' is what counts in
+a game, 'margin' tells a close game from a clear one and so has less variance, and the
+blend keeps most of the meaning of a win with part of the lower variance of the margin.
+"""
+
+from cards import CARD_INDEX, POINTS
+
+UTILITIES = ('win', 'margin', 'blend')
+
+
+class Utility:
+    """The utility called name (one of UTILITIES), with weight the share of the win in the blend."""
+
+    def __init__(self, name='win', weight=0.5):
+        if name not in UTILITIES:
+            raise ValueError("Unknown utility: {}".format(name))
+        self.name = name
+        self.weight = weight
+
+    def of_points(self, points):
+        """Return the utility of a player who took points out of 120, a number or a NumPy array."""
+        win = (points > 60) + 0.5 * (points == 60)
+        if self.name == 'win':
+            return win
+        if self.name == 'margin':
+            return points / 120
+        return self.weight * win + (1 - self.weight) * (points / 120)
+
+    def expected(self, win_probability, margin):
+        """Return the expected utility of a player who wins with win_probability and expects
+        to end with a point difference of margin, for the estimates of the evaluators."""
+        share = min(max(0.5 + margin / 240, 0.0), 1.0)
+        if self.name == 'win':
+            return win_probability
+        if self.name == 'margin':
+            return share
+        return self.weight * win_probability + (1 - self.weight) * share
+
+    def __call__(self, state, player):
+        """Return the utility of the final state for player, as Briscola.utility."""
+        return self.of_points(sum(POINTS[CARD_INDEX[card]] for card in state['taken' + str(player)]))
+
+    def __repr__(self):
+        if self.name == 'blend':
+            return 'Utility({!r}, weight={})'.format(self.name, self.weight)
+        return 'Utility({!r})'.format(self.name)
+
+
+def make_utility(utility, **kwargs):
+    """Return the utility described by utility: None, a name of UTILITIES built with kwargs,
+    or a Utility."""
+    if isinstance(utility, str):
+        return Utility(utility, **kwargs)
+    return utility
@@ -5,8 +5,10 @@ import collections
 import collections.abc
 import functools
 import heapq
+import math
 import os.path
 import random
+import time
 from itertools import chain, combinations
 from statistics import mean
 
@@ -791,7 +793,20 @@ class MCT_Node:
 
 
 def ucb(n, C=1.4):
-    return np.inf if n.N == 0 else n.U / n.N + C * np.sqrt(np.log(n.parent.N) / n.N)
+    return math.inf if n.N == 0 else n.U / n.N + C * math.sqrt(math.log(n.parent.N) / n.N)
+
+
+def search_iterations(N, time_limit_ms=None):
+    """Yield the iteration numbers of a search: N of them, or if time_limit_ms
+    is given as many as fit in it (at least one). The clock is read once per iteration."""
+    if time_limit_ms is None:
+        yield from range(N)
+        return
+    deadline = time.perf_counter() + time_limit_ms / 1000
+    i = 0
+    while i == 0 or time.perf_counter() < deadline:
+        yield i
+        i += 1
 
 
 # ______________________________________________________________________________
@@ -0,0 +1,173 @@
+"""
+Value network: an estimate of the utility of a state, to stop the rollouts early.
+
+A state is seen from one player and encoded as a vector of card features, see encode.
+ValueNetwork is a small multilayer perceptron (a linear model with n_hidden=0) in NumPy,
+trained on self-play positions to predict the probability that the player wins, the
+expected Briscola.utility (or another utility of utilities.py, see train_value_network.py).
+It is called as an evaluator of the searches:
+
+    values = evaluator(states, players)
+
+on a list of non-terminal states and the player each one is seen from (or a single
+player for all of them), and returns an array of their values. All the states are
+encoded and evaluated in one batch, so a search that cuts its rollouts off after a few
+tricks (see tools.playout) evaluates many leaves per call. The networks are trained
+and saved by train_value_network.py.
+"""
+
+import numpy as np
+
+from cards import CARD_INDEX, POINTS
+
+# the locations of a card seen from a player, one block of 40 features each
+LOCATIONS = ('own hand', 'opponent hand', 'own taken', 'opponent taken', 'table', 'deck', 'briscola')
+N_FEATURES = 40 * len(LOCATIONS) + 4  # and: to move, own points, opponent points, cards in the deck
+
+
+def encode(states, players):
+    """
+    Return the features of states seen from players (a list, or one player for all the states),
+    as a float32 array (len(states), N_FEATURES): for each location of LOCATIONS a 1 for the cards
+    that are there, then whether the player is to move, the points taken by the player and the
+    opponent over 120 and the cards left in the deck over 33.
+    """
+    if isinstance(players, int):
+        players = [players] * len(states)
+    X = np.zeros((len(states), N_FEATURES), dtype=np.float32)
+    rows, columns = [], []
+    extra = 40 * len(LOCATIONS)
+    for row, (state, player) in enumerate(zip(states, players)):
+        me, other = str(player), str(3 - player)
+        piles = (state['hand' + me], state['hand' + other], state['taken' + me], state['taken' + other],
+                 state['table'], state['deck'], [state['briscola']])
+        for location, cards in enumerate(piles):
+            for card in cards:
+                rows.append(row)
+                columns.append(40 * location + CARD_INDEX[card])
+        X[row, extra] = state['player'] == player
+        X[row, extra + 1] = sum(POINTS[CARD_INDEX[card]] for card in state['taken' + me]) / 120
+        X[row, extra + 2] = sum(POINTS[CARD_INDEX[card]] for card in state['taken' + other]) / 120
+        X[row, extra + 3] = len(state['deck']) / 33
+    X[rows, columns] = 1
+    return X
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-np.clip(x, -30, 30)))
+
+
+class ValueNetwork:
+    """
+    Multilayer perceptron with one hidden layer of n_hidden ReLU units and a sigmoid output,
+    the probability that the player the state is seen from wins. With n_hidden=0 it is a
+    logistic regression on the features. seed is the seed of the initial weights.
+    """
+
+    def __init__(self, n_hidden=64, seed=None):
+        rng = np.random.default_rng(seed)
+        self.n_hidden = n_hidden
+        if n_hidden:
+            self.params = [rng.normal(0, np.sqrt(2 / N_FEATURES), (N_FEATURES, n_hidden)).astype(np.float32),
+                           np.zeros(n_hidden, dtype=np.float32),
+                           rng.normal(0, np.sqrt(1 / n_hidden), (n_hidden, 1)).astype(np.float32),
+                           np.zeros(1, dtype=np.float32)]
+        else:
+            self.params = [np.zeros((N_FEATURES, 1), dtype=np.float32), np.zeros(1, dtype=np.float32)]
+
+    def forward(self, X):
+        """Return the logits of the rows of X, and the hidden activations (None without a hidden layer)."""
+        if not self.n_hidden:
+            W, b = self.params
+            return (X @ W + b)[:, 0], None
+        W1, b1, W2, b2 = self.params
+        hidden = np.maximum(X @ W1 + b1, 0)
+        return (hidden @ W2 + b2)[:, 0], hidden
+
+    def predict(self, X):
+        """Return the probability of a win of each row of features X."""
+        return sigmoid(self.forward(X)[0])
+
+    def __call__(self, states, players):
+        """Return the values of states seen from players, evaluated in one batch."""
+        return self.predict(encode(states, players))
+
+    def gradients(self, X, y, l2=0.0):
+        """Return the log loss of X against the targets y (in [0, 1]) and its gradients of the parameters."""
+        logits, hidden = self.forward(X)
+        p = sigmoid(logits)
+        loss = float(-np.mean(y * np.log(p + 1e-7) + (1 - y) * np.log(1 - p + 1e-7)))
+        delta = ((p - y) / len(X))[:, None].astype(np.float32)
+        if not self.n_hidden:
+            W, b = self.params
+            return loss, [X.T @ delta + l2 * W, delta.sum(axis=0)]
+        W1, b1, W2, b2 = self.params
+        back = (delta @ W2.T) * (hidden > 0)
+        return loss, [X.T @ back + l2 * W1, back.sum(axis=0), hidden.T @ delta + l2 * W2, delta.sum(axis=0)]
+
+    def loss(self, X, y):
+        """Return the log loss and the accuracy (the share of the rows where p > 0.5 agrees with y > 0.5) on X, y."""
+        p = self.predict(X)
+        loss = -np.mean(y * np.log(p + 1e-7) + (1 - y) * np.log(1 - p + 1e-7))
+        return float(loss), float(np.mean((p > 0.5) == (y > 0.5)))
+
+    def fit(self, X, y, epochs=10, batch_size=256, lr=1e-3, l2=1e-5, seed=None, validation=None, verbose=False):
+        """
+        Train on the features X and targets y with Adam, in shuffled minibatches of batch_size.
+        validation is an optional (X, y) pair. Return the history of the training loss of each
+        epoch, and of the validation loss if given.
+        """
+        rng = np.random.default_rng(seed)
+        y = np.asarray(y, dtype=np.float32)
+        m = [np.zeros_like(p) for p in self.params]
+        v = [np.zeros_like(p) for p in self.params]
+        beta1, beta2, t = 0.9, 0.999, 0
+        history = []
+        for epoch in range(epochs):
+            order = rng.permutation(len(X))
+            total = 0.0
+            for begin in range(0, len(X), batch_size):
+                batch = order[begin:begin + batch_size]
+                loss, grads = self.gradients(X[batch], y[batch], l2)
+                total += loss * len(batch)
+                t += 1
+                for p, g, m_p, v_p in zip(self.params, grads, m, v):
+                    m_p *= beta1
+                    m_p += (1 - beta1) * g
+                    v_p *= beta2
+                    v_p += (1 - beta2) * g * g
+                    p -= lr * (m_p / (1 - beta1 ** t)) / (np.sqrt(v_p / (1 - beta2 ** t)) + 1e-8)
+            entry = {'epoch': epoch + 1, 'loss': total / len(X)}
+            if validation is not None:
+                entry['validation_loss'], entry['validation_accuracy'] = self.loss(*validation)
+            history.append(entry)
+            if verbose:
+                print(", ".join("{} {:.4f}".format(key, value) if isinstance(value, float) else "{} {}".format(key, value)
+                                for key, value in entry.items()))
+        return history
+
+    def save(self, path):
+        """Save the network to path, a .npz file."""
+        np.savez(path, n_hidden=self.n_hidden, *self.params)
+
+    @classmethod
+    def load(cls, path):
+        """Return the network saved to path by save."""
+        with np.load(path) as data:
+            network = cls(int(data['n_hidden']))
+            network.params = [data['arr_{}'.format(i)] for i in range(len(network.params))]
+        return network
+
+    def __repr__(self):
+        return 'ValueNetwork(n_hidden={})'.format(self.n_hidden)
+
+
+def make_evaluator(evaluator):
+    """Return the evaluator described by evaluator: None, the path of a saved ValueNetwork, or an evaluator.
+    'heuristic' gives None too, so that tools.leaf_values calls tools.heuristic_evaluator with the
+    utility of the search."""
+    if evaluator == 'heuristic':
+        return None
+    if isinstance(evaluator, str):
+        return ValueNetwork.load(evaluator)
+    return evaluator